@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+# ./bench/blocks.py
+#
+# Verification of a large modified file: full scan against the block hash
+# tree, with every changed range or stopping at the first changed block
+#
+"""
+  python3 bench/blocks.py [size in MB, default 256] [block KB, default 1024]
+"""
+import os, sys, tempfile
+
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fs import FSIntegrity
+
+
+def timeit(func, *args, **kwargs):
+  start  = perf_counter()
+  result = func(*args, **kwargs)
+
+  return result, perf_counter() - start
+#timeit
+
+
+def main():
+  size  = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+  block = int(sys.argv[2]) if len(sys.argv) > 2 else 1024
+
+  FSIntegrity.block_size = block * 1024
+
+  with tempfile.NamedTemporaryFile() as fw:
+    chunk = os.urandom(1024 * 1024)
+    for _ in range(size):
+      fw.write(chunk)
+    fw.flush()
+
+    _, tm = timeit(FSIntegrity.scan, fw.name)
+    print(f'{"scan (sha256 + entropy)":32} {tm:7.3f} s {size / tm:8.1f} MB/s')
+
+    trees = {}
+    for algorithm in FSIntegrity.algorithms:
+      FSIntegrity.block_algorithm = algorithm
+      trees[algorithm], tm = timeit(FSIntegrity.scan_blocks, fw.name, entropy=False)
+      print(f'{"baseline tree " + algorithm:32} {tm:7.3f} s {size / tm:8.1f} MB/s')
+    #endfor
+
+    # a write at 10% of the file
+    FSIntegrity.block_algorithm = 'blake2b'
+    fw.seek(size * 1024 * 1024 // 10)
+    fw.write(b'encrypted')
+    fw.flush()
+
+    stored = {
+      'algorithm': 'blake2b', 'block_size': FSIntegrity.block_size, 'size': size * 1024 * 1024,
+      'leaves': trees['blake2b'].leaves
+    }
+
+    for policy, stop in [ ('ranges', False), ('verdict', True) ]:
+      result, tm = timeit(FSIntegrity.scan_blocks, fw.name, stored, stop=stop)
+      print(f'{"verify " + policy:32} {tm:7.3f} s, changed {FSIntegrity.ranges(result.changed)}')
+    #endfor
+  #endwith
+#main
+
+
+if __name__ == '__main__':
+  main()
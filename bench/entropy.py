@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+#
+# ./bench/entropy.py
+#
+# Micro-benchmark shannon_entropy against the byte-per-read implementation
+#
+"""
+  python3 bench/entropy.py [size in MB, default 8]
+"""
+import os, sys, tempfile
+
+from math import log2
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import shannon_entropy, numpy
+
+
+def legacy_shannon_entropy(f):
+  entropy = 0.0
+  freq    = [ 0 ] * 256
+
+  with open(f, 'rb') as fr:
+    while True:
+      b = fr.read(1)
+      if not b:
+        break
+
+      freq[ord(b)] += 1
+    #endwhile
+
+    total = fr.tell()
+  #endwith
+
+  for s in freq:
+    if s:
+      prob = s / total
+      entropy += prob * log2(prob)
+
+  return round(-entropy, 2)
+#legacy_shannon_entropy
+
+
+def timeit(func, *args, repeat=1):
+  best = None
+  for _ in range(repeat):
+    start   = perf_counter()
+    result  = func(*args)
+    elapsed = perf_counter() - start
+    best    = elapsed if best is None else min(best, elapsed)
+  #endfor
+
+  return result, best
+#timeit
+
+
+def main():
+  size = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+
+  with tempfile.NamedTemporaryFile(delete=False) as fw:
+    fw.write(os.urandom(size * 1024 * 1024))
+
+  try:
+    old, told = timeit(legacy_shannon_entropy, fw.name)
+    new, tnew = timeit(shannon_entropy, fw.name, repeat=5)
+
+    print(f'file size {size} MB, numpy {"yes" if numpy else "no"}')
+    print(f'legacy  {told:8.3f} s  {size / told:10.2f} MB/s  entropy {old}')
+    print(f'chunked {tnew:8.3f} s  {size / tnew:10.2f} MB/s  entropy {new}')
+    print(f'speedup {told / tnew:.1f}x')
+  finally:
+    os.unlink(fw.name)
+#main
+
+
+if __name__ == "__main__":
+  main()
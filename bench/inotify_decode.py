@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+#
+# ./bench/inotify_decode.py
+#
+# Events decoded per second on synthetic inotify buffers
+#
+"""
+  python3 bench/inotify_decode.py [events, default 200000] [match ratio, default 0.1]
+"""
+import os, sys, random
+
+from struct import pack
+from time   import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fs import FSEvent, IN_MODIFY, IN_IGNORED
+
+
+def build(events):
+  """
+    inotify buffers as returned by read(), names padded to 16 bytes and
+    one of every 50 events without name (IN_IGNORED)
+  """
+  out = []
+  for i in range(events):
+    if i % 50 == 0:
+      out.append(pack('iIII', i % 1000, IN_IGNORED, 0, 0))
+      continue
+
+    name    = f'file-{i}.txt'.encode()
+    length  = (len(name) // 16 + 1) * 16
+    out.append(pack('iIII', i % 1000, IN_MODIFY, 0, length) + name.ljust(length, b'\0'))
+  #endfor
+
+  return b''.join(out)
+#build
+
+
+def legacy(data, wds):
+  n = 0
+  for wd, mask, cookie, name in FSEvent.parse(data):
+    if wd in wds:
+      name.decode()
+    n += 1
+
+  return n
+#legacy
+
+
+def decode(view, wds):
+  n = 0
+  for wd, mask, cookie, offset, length in FSEvent.decode(view, len(view)):
+    if wd in wds:
+      FSEvent.filename(view, offset, length).decode()
+    n += 1
+
+  return n
+#decode
+
+
+def main():
+  events = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+  ratio  = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+
+  data = build(events)
+  wds  = set(random.sample(range(1000), int(1000 * ratio)))
+
+  print(f'{events} events, {len(data)} bytes, {int(ratio * 100)}% pass the wd filter')
+  view = memoryview(bytearray(data))  # the buffer readinto fills
+  for func, buffer in [(legacy, data), (decode, view)]:
+    start = perf_counter()
+    n     = func(buffer, wds)
+    tm    = perf_counter() - start
+    print(f'{func.__name__:8} {n:8} events  {tm:8.3f} s  {n / tm:12.0f} events/s')
+  #endfor
+#main
+
+
+if __name__ == "__main__":
+  main()
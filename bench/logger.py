@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#
+# ./bench/logger.py
+#
+# Cost for the caller of a burst of alerts, synchronous write per message
+# against the LogWriter thread
+#
+"""
+  python3 bench/logger.py [records, default 100000]
+"""
+import os, sys, tempfile
+
+from time import perf_counter, strftime, localtime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import Logger, LogWriter
+
+
+def legacy(fd, msg):
+  # previous Logger.__logging
+  msg = msg.rstrip()
+  tm  = strftime("%Y-%m-%d %H:%M:%S ", localtime())
+
+  fd.write(f'{tm} --> {msg}\n')
+  fd.flush()
+  fd.seek(0)
+#legacy
+
+
+def main():
+  records = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+  with tempfile.TemporaryDirectory() as tmp:
+    with open(os.path.join(tmp, 'legacy.logs'), 'a+') as fd:
+      start = perf_counter()
+      for i in range(records):
+        legacy(fd, f'WARNING - modify `/watch/dir/file{i}.txt`, entropy 7.91')
+      sync = perf_counter() - start
+    #endwith
+
+    # the shipped bound: Ok records are shed with the queue full, alerts
+    # wait for the writer or are queued over the bound
+    print(f'records {records}, max_records {LogWriter.max_records}')
+    print(f'synchronous write : {sync * 1000:9.1f} ms in the caller, {sync / records * 1e6:.2f} us/record')
+
+    for level, name in [ (-3, 'CRITICAL'), (-1, 'Ok') ]:
+      Logger.logfile = os.path.join(tmp, f'irondome-{name}.logs')
+      logger = Logger()
+      writer = Logger.writer
+
+      start = perf_counter()
+      for i in range(records):
+        logger.log((level, f'modify `/watch/dir/file{i}.txt`, entropy 7.91'))
+      queued = perf_counter() - start
+
+      Logger.shutdown()
+      drained = perf_counter() - start
+
+      with open(Logger.logfile, 'rb') as fr:
+        lines = fr.read().count(f'{name} - '.encode())
+
+      print(f'LogWriter {name:8}: {queued * 1000:9.1f} ms in the caller, {queued / records * 1e6:.2f} us/record, ' + \
+            f'drained {drained * 1000:.1f} ms, written {lines}, dropped {writer.dropped}, spilled {writer.spilled}')
+    #endfor
+  #endwith
+#main
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# ./bench/memory.py
+#
+# Stress test of the memory governor: baseline of a large tree and one
+# inotify watch per directory under -maxmemory, peak RSS against the limit
+#
+"""
+  python3 bench/memory.py [files, default 1000000] [limit MB, default 100] [tree path]
+
+  The tree is created once (files of 64 bytes, 1000 per directory) and kept
+  when a path is given, exit status 1 if the peak RSS went over the limit.
+"""
+import os, sys, json, tempfile, shutil
+
+from threading import Thread, Event
+from time      import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fs    import FSIntegrity, FSWatcher, FSEvent
+from utils import Logger, explore, fp_write, memory_governor
+
+
+def build_tree(path, files, per_dir=1000):
+  marker = os.path.join(path, f'.tree-{files}')
+  if os.path.exists(marker):
+    return
+
+  payload = os.urandom(64 * per_dir)
+  for n in range(0, files, per_dir):
+    directory = os.path.join(path, f'd{n // per_dir // 100}', f'd{n // per_dir}')
+    os.makedirs(directory, exist_ok=True)
+
+    for i in range(n, min(n + per_dir, files)):
+      with open(os.path.join(directory, f'f{i}'), 'wb') as fw:
+        fw.write(payload[(i % per_dir) * 64: (i % per_dir + 1) * 64])
+  #endfor
+
+  open(marker, 'w').close()
+#build_tree
+
+
+def main():
+  files = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+  limit = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+  keep  = len(sys.argv) > 3
+
+  workdir = sys.argv[3] if keep else tempfile.mkdtemp(prefix='irondome-memory-')
+  tree    = os.path.join(workdir, 'tree')
+  dbdir   = tempfile.mkdtemp(prefix='irondome-memory-db-')
+  os.makedirs(tree, exist_ok=True)
+
+  start = perf_counter()
+  build_tree(tree, files)
+  built = perf_counter() - start
+
+  Logger.logfile = os.path.join(dbdir, 'irondome.logs')
+  FSIntegrity.basepath = dbdir
+
+  # the governor samples every interval, this thread every 20 ms for the peak
+  memory_governor.limit     = limit * 1024 * 1024
+  memory_governor.interval  = 0.1
+  memory_governor.max_pause = 2.0
+  memory_governor.start()
+
+  stop = Event()
+  peak = [ 0 ]
+  def sampler():
+    while not stop.wait(0.02):
+      peak[0] = max(peak[0], memory_governor.sample())
+  #sampler
+
+  th = Thread(target=sampler, daemon=True)
+  th.start()
+
+  # FSWatcher needs a baseline that is not empty
+  integrity = FSIntegrity(True)
+  fp_write('seed', os.path.join(dbdir, 'seed'))
+  integrity.run(os.path.join(dbdir, 'seed'))
+
+  watcher = FSWatcher([], workers=2)
+  flags   = FSEvent.get_flags(FSEvent, [ 'modify', 'create', 'delete' ])
+
+  start   = perf_counter()
+  watches = 1
+  watcher.add_event(tree, flags=flags)
+  for path in explore(tree, directory=True):
+    watcher.add_event(path, flags=flags)
+    watches += 1
+  watched = perf_counter() - start
+
+  start = perf_counter()
+  integrity.run(tree)
+  hashed = perf_counter() - start
+
+  stop.set()
+  th.join()
+  memory_governor.stop()
+
+  result = {
+    'files': files,
+    'limit_mb': limit,
+    'peak_rss_mb': memory_governor.mb(max(peak[0], memory_governor.peak)),
+    'held': max(peak[0], memory_governor.peak) <= memory_governor.limit,
+    'pauses': memory_governor.pauses,
+    'exceeded': memory_governor.exceeded,
+    'shrinks': memory_governor.shrinks,
+    'watches': watches,
+    'build_s': round(built, 2),
+    'watch_s': round(watched, 2),
+    'baseline_s': round(hashed, 2),
+    'log_dropped': Logger.writer.dropped if Logger.writer else 0,
+    'usage_mb': { x: memory_governor.mb(y) for x, y in memory_governor.usage().items() }
+  }
+  print(json.dumps(result, indent=2))
+
+  Logger.shutdown()
+  shutil.rmtree(dbdir, ignore_errors=True)
+  if not keep:
+    shutil.rmtree(workdir, ignore_errors=True)
+
+  sys.exit(0 if result['held'] else 1)
+#main
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+#
+# ./bench/pipeline.py
+#
+# Watch -> verify -> alert pipeline: scripted workloads on a synthetic tree
+# against a running FSWatcher and FSIntegrity, results as json
+#
+"""
+  python3 bench/pipeline.py [options]
+
+    --files N          files of the tree, default 2000
+    --size S|MIN:MAX   bytes per file, default 4096
+    --depth D          levels of directories, default 2
+    --fanout F         subdirectories per directory, default 4
+    --ops N            files touched by every workload, default 1000
+    --workloads LIST   create,rename,modify,ransomware (default all)
+    --workers N        verifier threads, default 2
+    --coalesce MS      quiet window of the coalescer, default 250, 0 disables it
+    --jobs N           hash processes of the baseline, default 1
+    --seed N           seed of sizes, contents and chosen files, default 42
+    --timeout S        seconds waiting for the alerts of a workload, default 120
+    --output FILE      write the json to FILE (stdout by default)
+    --compare FILE     print the change of every metric against a previous json
+
+  The workloads run in a child process, so the watcher only pays for
+  reading and verifying events. Latency is from the first write of a path
+  to its first alert, a path written with no alert is counted as missed.
+"""
+import os, re, sys, json, random, resource, argparse, tempfile, shutil, platform
+
+from multiprocessing import Process, Pipe
+from threading       import Thread, Event
+from time            import monotonic, sleep, strftime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fs    import FSIntegrity, FSWatcher, FSEvent
+from utils import Logger, explore, memory_governor, metrics_registry
+
+
+events = [ 'modify', 'attrib', 'create', 'delete', 'delete self', 'move from', 'move to' ]
+
+
+class Recorder(object):
+  """
+    Logger.log replacement, monotonic time, level and path of every alert
+  """
+  path = re.compile(r'`(.*?)`')
+
+  def __init__(self):
+    self.alerts = []
+
+  def __call__(self, logger, msg):
+    match = self.path.search(msg[1])
+    self.alerts.append((monotonic(), msg[0], match.group(1) if match else None))
+  #__call__
+#class Recorder
+
+
+class RSSSampler(Thread):
+  """
+    peak RSS of this process while a workload runs
+  """
+  def __init__(self, interval=0.01):
+    Thread.__init__(self, daemon=True)
+    self.interval = interval
+    self.peak     = 0
+    self.__stop   = Event()
+
+  def run(self):
+    while not self.__stop.wait(self.interval):
+      self.peak = max(self.peak, memory_governor.sample())
+
+  def stop(self):
+    self.__stop.set()
+    self.join()
+    return self.peak
+#class RSSSampler
+
+
+def sizes(spec, count, rng):
+  low, _, high = spec.partition(':')
+  low, high    = int(low), int(high or low)
+
+  return [ rng.randint(low, high) for _ in range(count) ]
+#sizes
+
+
+def build_tree(path, files, size, depth, fanout, rng):
+  """
+    return: list of the files, spread over every directory of the tree
+  """
+  dirs = [ path ]
+  for level in range(depth):
+    dirs += [ os.path.join(d, f'd{i}') for d in dirs if d.count(os.sep) - path.count(os.sep) == level
+                                        for i in range(fanout) ]
+
+  for d in dirs:
+    os.makedirs(d, exist_ok=True)
+
+  out = []
+  for n, length in enumerate(sizes(size, files, rng)):
+    filepath = os.path.join(dirs[n % len(dirs)], f'f{n}.dat')
+    with open(filepath, 'wb') as fw:
+      fw.write(rng.randbytes(length // 2) + b'\0' * (length - length // 2))
+
+    out.append(filepath)
+  #endfor
+
+  return out
+#build_tree
+
+
+def workload(name, files, ops, size, seed, conn):
+  """
+    child process, sends back { path: [ monotonic time of every write ] }
+  """
+  rng    = random.Random(seed)
+  chosen = rng.sample(files, min(ops, len(files)))
+  writes = {}
+
+  def mark(path):
+    writes.setdefault(path, []).append(monotonic())
+
+  if name == 'create':
+    for n, length in enumerate(sizes(size, ops, rng)):
+      filepath = os.path.join(os.path.dirname(files[n % len(files)]), f'new{n}.dat')
+      mark(filepath)
+      with open(filepath, 'wb') as fw:
+        fw.write(rng.randbytes(length))
+
+  elif name == 'rename':
+    for filepath in chosen:
+      mark(filepath)
+      mark(filepath + '.renamed')
+      os.rename(filepath, filepath + '.renamed')
+    #endfor
+
+  elif name == 'modify':
+    for filepath in chosen:
+      mark(filepath)
+      with open(filepath, 'r+b') as fw:
+        fw.write(rng.randbytes(min(4096, os.path.getsize(filepath) or 1)))
+
+  elif name == 'ransomware':
+    # read, encrypt in place, rename with the extension of the ransom note
+    for filepath in chosen:
+      with open(filepath, 'rb') as fr:
+        data = fr.read()
+
+      key  = rng.randbytes(len(data))
+      mark(filepath)
+      with open(filepath, 'r+b') as fw:
+        fw.write(bytes(a ^ b for a, b in zip(data, key)))
+
+      mark(filepath + '.locked')
+      os.rename(filepath, filepath + '.locked')
+    #endfor
+  #endif
+
+  conn.send(writes)
+  conn.close()
+#workload
+
+
+def percentile(values, p):
+  return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else None
+
+
+def settle(recorder, expected, quiet, timeout):
+  """
+    wait until every path written has an alert, or no alert came for quiet
+    seconds, or timeout
+  """
+  start = monotonic()
+  seen  = 0
+  last  = monotonic()
+
+  while monotonic() - start < timeout:
+    sleep(0.05)
+
+    if len(recorder.alerts) != seen:
+      seen, last = (len(recorder.alerts), monotonic())
+      if expected <= { x[2] for x in recorder.alerts }:
+        return
+
+    elif monotonic() - last >= quiet:
+      return
+  #endwhile
+#settle
+
+
+def measure(recorder, writes, first, watcher, before):
+  """
+    return: dict of the results of one workload
+  """
+  alerts = {}
+  for when, _, path in recorder.alerts:
+    alerts.setdefault(path, []).append(when)
+
+  latencies = []
+  for path, times in writes.items():
+    if path in alerts:
+      latencies.append(alerts[path][0] - times[0])
+
+  latencies.sort()
+  end      = max((x[0] for x in recorder.alerts), default=first)
+  elapsed  = max(end - first, 1e-9)
+  counters = counters_snapshot(watcher)
+  delta    = { k: counters[k] - before[k] for k in counters }
+
+  return {
+    'paths': len(writes),
+    'alerts': len(recorder.alerts),
+    'critical': sum(1 for x in recorder.alerts if x[1] == -3),
+    'missed': sum(1 for x in writes if x not in alerts),
+    'elapsed_s': round(elapsed, 3),
+    'events': delta['events'],
+    'events_per_s': round(delta['events'] / elapsed, 1),
+    'latency_p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+    'latency_p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+    'latency_max_ms': round(latencies[-1] * 1000, 2) if latencies else None,
+    'hashed_mb': round(delta['hashed_bytes'] / 1024 / 1024, 2),
+    'hash_mb_per_s': round(delta['hashed_bytes'] / 1024 / 1024 / elapsed, 2),
+    'overflows': delta['overflows'],
+    'backpressure': delta['backpressure']
+  }
+#measure
+
+
+def counters_snapshot(watcher):
+  snapshot = metrics_registry.snapshot()
+
+  return {
+    'events': int(snapshot.get('fswatcher_events') or 0),
+    'overflows': watcher.overflows,
+    'hashed_bytes': int(snapshot.get('integrity_hashed_bytes') or 0),
+    'backpressure': watcher.verifier.backpressure if watcher.verifier else 0
+  }
+#counters_snapshot
+
+
+def compare(old, new):
+  """
+    print the change of every numeric metric of new against old
+  """
+  for section in [ 'baseline' ] + list(new['workloads']):
+    a = old['baseline'] if section == 'baseline' else old['workloads'].get(section, {})
+    b = new['baseline'] if section == 'baseline' else new['workloads'][section]
+
+    for key, value in b.items():
+      previous = a.get(key)
+      if not isinstance(value, (int, float)) or not isinstance(previous, (int, float)):
+        continue
+
+      change = f'{100 * (value - previous) / previous:+.1f}%' if previous else 'n/a'
+      print(f'{section:12} {key:16} {previous:>12} -> {value:>12}  {change}')
+    #endfor
+  #endfor
+#compare
+
+
+def parse_arguments():
+  parser = argparse.ArgumentParser(description='watch -> verify -> alert benchmark')
+  parser.add_argument('--files', type=int, default=2000)
+  parser.add_argument('--size', default='4096')
+  parser.add_argument('--depth', type=int, default=2)
+  parser.add_argument('--fanout', type=int, default=4)
+  parser.add_argument('--ops', type=int, default=1000)
+  parser.add_argument('--workloads', default='create,rename,modify,ransomware')
+  parser.add_argument('--workers', type=int, default=2)
+  parser.add_argument('--coalesce', type=int, default=250)
+  parser.add_argument('--jobs', type=int, default=1)
+  parser.add_argument('--seed', type=int, default=42)
+  parser.add_argument('--timeout', type=float, default=120)
+  parser.add_argument('--output')
+  parser.add_argument('--compare')
+
+  return parser.parse_args()
+#parse_arguments
+
+
+def main():
+  args = parse_arguments()
+  tmp  = tempfile.mkdtemp(prefix='irondome-pipeline-')
+  rng  = random.Random(args.seed)
+
+  try:
+    tree = os.path.join(tmp, 'tree')
+    FSIntegrity.basepath = tmp
+
+    files = build_tree(tree, args.files, args.size, args.depth, args.fanout, rng)
+
+    start = monotonic()
+    FSIntegrity(True).run(tree, jobs=args.jobs)
+    elapsed = monotonic() - start
+    size    = sum(os.path.getsize(x) for x in files)
+
+    result = {
+      'date': strftime('%Y-%m-%dT%H:%M:%S'),
+      'python': platform.python_version(),
+      'config': { k: v for k, v in vars(args).items() if k not in ('output', 'compare') },
+      'baseline': {
+        'files': len(files),
+        'mb': round(size / 1024 / 1024, 2),
+        'elapsed_s': round(elapsed, 3),
+        'files_per_s': round(len(files) / elapsed, 1),
+        'hash_mb_per_s': round(size / 1024 / 1024 / elapsed, 2)
+      },
+      'workloads': {}
+    }
+
+    recorder = Recorder()
+    log      = Logger.log
+    Logger.log = lambda self, msg: recorder(self, msg)
+
+    quiet   = args.coalesce / 1000
+    watcher = FSWatcher([], workers=args.workers, quiet=quiet, maxdelay=max(2.0, quiet))
+    flags   = FSEvent.get_flags(FSEvent, events)
+    for path in [ tree ] + list(explore(tree, directory=True)):
+      watcher.add_event(path, flags=flags)
+
+    th = Thread(target=watcher.loop)
+    th.start()
+
+    for n, name in enumerate(args.workloads.split(',')):
+      sleep(quiet + 0.2)  # events of the previous workload are out
+      recorder.alerts = []
+      before  = counters_snapshot(watcher)
+      sampler = RSSSampler()
+      sampler.start()
+
+      parent, child = Pipe()
+      proc = Process(target=workload, args=(name, files, args.ops, args.size, args.seed + n, child))
+      proc.start()
+      writes = parent.recv()
+      proc.join()
+
+      first = min(x[0] for x in writes.values()) if writes else monotonic()
+      settle(recorder, set(writes), quiet + 1.0, args.timeout)
+
+      measured = measure(recorder, writes, first, watcher, before)
+      measured['peak_rss_mb'] = memory_governor.mb(sampler.stop())
+      result['workloads'][name] = measured
+
+      # the files renamed by this workload are gone for the next ones
+      files = [ x for x in files if os.path.exists(x) ]
+    #endfor
+
+    watcher.terminate = True
+    th.join()
+    Logger.log = log
+
+    result['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+  finally:
+    shutil.rmtree(tmp, ignore_errors=True)
+
+  output = json.dumps(result, indent=2)
+  if args.output:
+    with open(args.output, 'w') as fw:
+      fw.write(output + '\n')
+  else:
+    print(output)
+
+  if args.compare:
+    with open(args.compare) as fr:
+      compare(json.load(fr), result)
+#main
+
+
+if __name__ == '__main__':
+  main()
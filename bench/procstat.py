@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+#
+# ./bench/procstat.py
+#
+# Cost of one IOStats.cpustats() and diskstats() tick on a synthetic
+# /proc/stat and /proc/diskstats
+#
+"""
+  python3 bench/procstat.py [cpus, default 192] [ticks, default 200] [devices, default 512]
+"""
+import os, sys, random, tempfile
+
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fs import IOStats
+
+
+def proc_stat(cpus):
+  lines = []
+  for name in [ 'cpu' ] + [ f'cpu{i}' for i in range(cpus) ]:
+    values = ' '.join(str(random.randint(0, 1 << 32)) for _ in range(10))
+    lines.append(f'{name} {values}')
+  #endfor
+
+  lines.append('intr ' + ' '.join('0' for _ in range(cpus * 16)))
+  lines.append('ctxt 123456789')
+  lines.append('softirq ' + ' '.join('0' for _ in range(11)))
+
+  return ('\n'.join(lines) + '\n').encode()
+#proc_stat
+
+
+def proc_diskstats(devices):
+  lines = []
+  for i in range(devices):
+    values = ' '.join(str(random.randint(0, 1 << 32)) for _ in range(17))
+    lines.append(f' 259 {i} nvme{i}n1 {values}')
+  #endfor
+
+  return ('\n'.join(lines) + '\n').encode()
+#proc_diskstats
+
+
+def legacy_diskstat(fd):
+  # previous IOStats.__read_diskstat__, one open file per disk/partition
+  fd.seek(0)
+  read_stats = fd.read(1024).strip().split()
+
+  return { x: float(read_stats[x]) for x in range(10) }
+#legacy_diskstat
+
+
+def legacy_read(fd, cpu):
+  # previous IOStats.__read_cpustats__, one full read and scan per cpu
+  fd.seek(0)
+  read_line_stats = fd.read().split('\n')
+  read_stats = []
+  while len(read_line_stats) > 0:
+    line = read_line_stats.pop(0)
+    if line.startswith(cpu):
+      read_stats = line.strip().split()
+      read_line_stats = []
+  #endwhile
+
+  return { x: int(read_stats[x]) for x in range(1, 10) }
+#legacy_read
+
+
+def main():
+  cpus  = int(sys.argv[1]) if len(sys.argv) > 1 else 192
+  ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+  disks = int(sys.argv[3]) if len(sys.argv) > 3 else 512
+
+  with tempfile.NamedTemporaryFile(suffix='.stat') as fw:
+    fw.write(proc_stat(cpus))
+    fw.flush()
+
+    names = [ 'cpu' ] + [ f'cpu{i}' for i in range(cpus) ]
+    with open(fw.name, 'r') as fd:
+      start = perf_counter()
+      for _ in range(ticks):
+        for cpu in names:
+          legacy_read(fd, cpu)
+      legacy = (perf_counter() - start) / ticks
+    #endwith
+
+    io = IOStats(interval=1)
+    io._IOStats__cpustat = open(fw.name, 'rb')
+    io.cpustats()
+
+    start = perf_counter()
+    for _ in range(ticks):
+      io.cpustats()
+    single = (perf_counter() - start) / ticks
+  #endwith
+
+  with tempfile.TemporaryDirectory() as tmp:
+    data  = proc_diskstats(disks)
+    files = []
+    for line in data.split(b'\n')[:-1]:
+      with open(os.path.join(tmp, line.split()[2].decode()), 'wb') as fw:
+        fw.write(b' '.join(line.split()[3:]))
+      files.append(open(fw.name, 'r'))
+    #endfor
+
+    start = perf_counter()
+    for _ in range(ticks):
+      for fd in files:
+        legacy_diskstat(fd)
+    legacy_disks = (perf_counter() - start) / ticks
+
+    [ fd.close() for fd in files ]
+
+    with open(os.path.join(tmp, 'diskstats'), 'wb') as fw:
+      fw.write(data)
+
+    # every synthetic device is a disk
+    io.__disk_of__ = lambda name: name
+    io._IOStats__diskstat = open(fw.name, 'rb')
+    io.diskstats()
+
+    start = perf_counter()
+    for _ in range(ticks):
+      io.diskstats()
+    single_disks = (perf_counter() - start) / ticks
+  #endwith
+
+  print(f'cpus {cpus}, {len(io.cpus)} parsed')
+  print(f'legacy per cpu read : {legacy * 1000:8.3f} ms/tick, {legacy * 100:.3f}% of a core at 1 s')
+  print(f'single read         : {single * 1000:8.3f} ms/tick, {single * 100:.3f}% of a core at 1 s')
+  print(f'speedup             : {legacy / single:.1f}x')
+  print(f'devices {disks}, {len(io.devices)} parsed')
+  print(f'legacy file per dev : {legacy_disks * 1000:8.3f} ms/tick')
+  print(f'single read         : {single_disks * 1000:8.3f} ms/tick')
+  print(f'speedup             : {legacy_disks / single_disks:.1f}x')
+#main
+
+
+if __name__ == '__main__':
+  main()
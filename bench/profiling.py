@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+# ./bench/profiling.py
+#
+# Cost of the stage timers, disabled and enabled
+#
+"""
+  python3 bench/profiling.py [iterations, default 1000000]
+"""
+import os, sys, tempfile
+
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fs    import FSIntegrity
+from utils import profiler
+
+
+def timer(iterations):
+  stage = profiler.stage('bench')
+  start = perf_counter()
+  for _ in range(iterations):
+    profiler.stop(stage, profiler.start())
+
+  return (perf_counter() - start) / iterations
+#timer
+
+
+def empty(iterations):
+  start = perf_counter()
+  for _ in range(iterations):
+    pass
+
+  return (perf_counter() - start) / iterations
+#empty
+
+
+def scan(path, iterations):
+  start = perf_counter()
+  for _ in range(iterations):
+    FSIntegrity.scan(path)
+
+  return (perf_counter() - start) / iterations
+#scan
+
+
+def main():
+  iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+  base = empty(iterations)
+
+  with tempfile.NamedTemporaryFile() as fw:
+    fw.write(os.urandom(4096))
+    fw.flush()
+
+    for enabled in [ False, True ]:
+      profiler.enable(enabled)
+      label = 'enabled' if enabled else 'disabled'
+
+      print(f'{label:9} start/stop {(timer(iterations) - base) * 1e9:7.1f} ns, ' + \
+            f'scan of 4 kB {scan(fw.name, iterations // 100) * 1e6:7.1f} us')
+    #endfor
+  #endwith
+
+  profiler.enable(False)
+#main
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+#
+# ./bench/registry.py
+#
+# Watch registry: insert, lookup and subtree delete cost, memory per watch
+#
+"""
+  python3 bench/registry.py [watches, default 500000] [fanout, default 10]
+"""
+import os, sys, tracemalloc
+
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fs import FSWatchRegistry
+
+
+def tree(watches, fanout):
+  """
+    directory paths, breadth first, every directory with fanout children
+  """
+  paths, n = ([ b'/watch' ], 0)
+  while len(paths) < watches:
+    parent = paths[n]
+    for i in range(fanout):
+      paths.append(parent + b'/d%d' % i)
+    n += 1
+  #endwhile
+
+  return paths[:watches]
+#tree
+
+
+def legacy_exists(watchers, path):
+  for wd in watchers.keys():
+    if watchers[wd]['path'] == path:
+      return True
+
+  return False
+#legacy_exists
+
+
+def timeit(label, func, count=None):
+  start  = perf_counter()
+  result = func()
+  tm     = perf_counter() - start
+  count  = count if count else len(result)
+  print(f'{label:24} {count:9} ops {tm:9.3f} s {tm / count * 1e6:10.3f} us/op')
+#timeit
+
+
+def main():
+  watches = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+  fanout  = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+  paths   = tree(watches, fanout)
+
+  print(f'{watches} watches, fanout {fanout}')
+
+  tracemalloc.start()
+  registry = FSWatchRegistry()
+  [ registry.add(wd, p) for wd, p in enumerate(paths, 1) ]
+  size, _ = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  print(f'{"memory":24} {size / watches:9.0f} bytes/watch (path included)')
+
+  registry = FSWatchRegistry()
+  timeit('insert', lambda: [ registry.add(wd, p) for wd, p in enumerate(paths, 1) ])
+
+  timeit('lookup wd', lambda: [ registry.get(wd) for wd in range(1, watches + 1) ], watches)
+  timeit('lookup path', lambda: [ p in registry for p in paths ], watches)
+
+  timeit(f'remove subtree {paths[1].decode()}', lambda: registry.remove_subtree(paths[1]))
+  timeit('remove wd', lambda: [ registry.remove(wd) for wd in range(1, watches + 1) ])
+
+  # the dict of ToObject scanned on every directory event
+  legacy = { wd: { 'path': p } for wd, p in enumerate(paths[:50000], 1) }
+  timeit('legacy lookup path (50k)', lambda: [ legacy_exists(legacy, paths[-1]) for _ in range(20) ], 20)
+#main
+
+
+if __name__ == "__main__":
+  main()
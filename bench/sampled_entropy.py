@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#
+# ./bench/sampled_entropy.py
+#
+# Exact against sampled shannon_entropy of large files: time, estimate and
+# confidence
+#
+"""
+  python3 bench/sampled_entropy.py [size in MB, default 256]
+"""
+import os, sys, tempfile
+
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import shannon_entropy, entropy_sampler
+
+
+def contents(size):
+  """
+    yield (name, chunk function) of the files, chunk n of 1 MB
+  """
+  text = (b'the quick brown fox jumps over the lazy dog 0123456789\n' * 20000)[:1024 * 1024]
+
+  yield 'random', lambda n: os.urandom(1024 * 1024)
+  yield 'text', lambda n: text
+  yield 'half encrypted', lambda n: os.urandom(1024 * 1024) if n % 2 else text
+  yield 'encrypted tail', lambda n: os.urandom(1024 * 1024) if n >= size * 9 // 10 else text
+#contents
+
+
+def timeit(func, *args, **kwargs):
+  start  = perf_counter()
+  result = func(*args, **kwargs)
+
+  return result, perf_counter() - start
+#timeit
+
+
+def main():
+  size = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+
+  for name, chunk in contents(size):
+    with tempfile.NamedTemporaryFile() as fw:
+      for n in range(size):
+        fw.write(chunk(n))
+      fw.flush()
+
+      exact, texact = timeit(shannon_entropy, fw.name)
+      (estimate, confidence), tsample = timeit(shannon_entropy, fw.name, sample=True)
+
+      print(f'{name:15} exact {exact:5} {texact:7.3f} s, sampled {estimate:5} ' + \
+            f'confidence {confidence:4} {tsample * 1000:7.2f} ms')
+    #endwith
+  #endfor
+
+  # 100 files with the rate limited to 10 MB/s, the first 10 MB get every block
+  entropy_sampler.rate = 10 * 1024 * 1024
+  sampled, limited = (entropy_sampler.sampled.value, entropy_sampler.limited.value)
+  with tempfile.NamedTemporaryFile() as fw:
+    fw.truncate(size * 1024 * 1024)
+
+    _, tm = timeit(lambda: [ shannon_entropy(fw.name, sample=True) for _ in range(100) ])
+    print(f'rate 10 MB/s, 100 files in {tm:.3f} s, {entropy_sampler.limited.value - limited} of ' + \
+          f'{entropy_sampler.sampled.value - sampled} sampled with less blocks')
+  #endwith
+#main
+
+
+if __name__ == '__main__':
+  main()
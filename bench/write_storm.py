@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+#
+# ./bench/write_storm.py
+#
+# Hash passes for a burst of writes to one file, with and without coalescing
+#
+"""
+  python3 bench/write_storm.py [writes, default 5000]
+"""
+import os, sys, tempfile, shutil
+
+from threading import Thread
+from time      import perf_counter, sleep
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fs    import FSIntegrity, FSWatcher, FSEvent
+from utils import fp_write
+
+
+class Counter(object):
+  """
+    logger replacement, counts alerts
+  """
+  def __init__(self):    self.alerts = []
+  def log(self, msg):    self.alerts.append(msg)
+  def debug(self, msg):  pass
+#class Counter
+
+
+def storm(path, writes, quiet):
+  scans = [ 0 ]
+  scan  = FSIntegrity.scan.__func__
+
+  def counting_scan(cls, *args, **kwargs):
+    scans[0] += 1
+    return scan(cls, *args, **kwargs)
+
+  FSIntegrity.scan = classmethod(counting_scan)
+
+  watcher = FSWatcher([], workers=0, quiet=quiet, maxdelay=2.0)
+  watcher.logger = Counter()
+  watcher.add_event(path, flags=FSEvent.get_flags(FSEvent, [ 'modify' ]))
+
+  th = Thread(target=watcher.loop)
+  th.start()
+
+  start = perf_counter()
+  with open(os.path.join(path, 'storm.db'), 'wb', buffering=0) as fw:
+    for n in range(writes):
+      fw.write(os.urandom(512))
+      if n % 10 == 0:
+        sleep(0.001)  # let the reader drain, inotify merges identical queued events
+
+  sleep(quiet + 0.5)
+  watcher.terminate = True
+  th.join()
+
+  FSIntegrity.scan = classmethod(scan)
+  return scans[0], watcher.logger.alerts, perf_counter() - start
+#storm
+
+
+def main():
+  writes = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+  tmp    = tempfile.mkdtemp()
+
+  try:
+    FSIntegrity.basepath = tmp
+    fp_write('seed', os.path.join(tmp, 'seed'))
+    FSIntegrity(True).run(os.path.join(tmp, 'seed'))
+
+    for label, quiet in [('per event', 0), ('coalesced', 0.25)]:
+      path = os.path.join(tmp, label.replace(' ', '-'))
+      os.makedirs(path)
+
+      scans, alerts, tm = storm(path, writes, quiet)
+      print(f'{label:10} {writes} writes, {scans:6} hash passes, {len(alerts):6} alerts, {tm:.2f} s')
+      if alerts:
+        print(f'{"":10} last alert: {alerts[-1][1]}')
+    #endfor
+  finally:
+    shutil.rmtree(tmp)
+#main
+
+
+if __name__ == "__main__":
+  main()
@@ -1,4 +1,11 @@
 from .inotify    import *
 from .integrity  import *
+from .registry   import *
+from .coalesce   import *
+from .verifier   import *
 from .monitor    import *
+from .fanotify   import *
+from .procstats  import *
+from .crypto     import *
+from .iowindow   import *
 from .iostats    import *
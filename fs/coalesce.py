@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#
+# ./fs/coalesce.py
+#
+# Merge the events of one file received within a quiet window
+#
+from heapq import heappush, heappop
+from time  import monotonic
+
+
+class FSCoalescer(object):
+  """
+    Pending events keyed by (wd, name). The masks of a burst are merged and
+    the entry is released once no event arrived for quiet seconds, or
+    maxdelay seconds after the first event of the burst.
+
+    An entry with an event of hold_mask (written file) is kept until an
+    event of release_mask arrives (file closed), or hold seconds after the
+    first event for writers that keep the file open.
+  """
+
+  def __init__(self, quiet=0.25, maxdelay=2.0, hold_mask=0, release_mask=0, hold=30):
+    self.quiet    = quiet
+    self.maxdelay = maxdelay
+
+    self.hold_mask    = hold_mask
+    self.release_mask = release_mask
+    self.hold         = hold
+
+    self.merged = 0  # events absorbed into a pending entry
+
+    # key -> [ entry, mask, flag, event, count, first, deadline ]
+    self.__pending  = {}
+    # heap (deadline, key). A key found before its current deadline is
+    # pushed again, an earlier deadline (release) pushes a second item
+    self.__deadline = []
+  #__init__
+
+  def __len__(self):
+    return len(self.__pending)
+
+  def add(self, key, entry, mask, flag, event, now=None):
+    now  = now if now is not None else monotonic()
+    item = self.__pending.get(key)
+
+    if item:
+      item[1] |= mask
+      item[2] |= flag
+      item[4] += 1
+      self.merged += 1
+    else:
+      item = self.__pending[key] = [ entry, mask, flag, event, 1, now, None ]
+
+    deadline = self.__next_deadline(item, mask, now)
+    if item[6] is None or deadline < item[6]:
+      heappush(self.__deadline, (deadline, key))
+
+    item[6] = deadline
+  #add
+
+  def __next_deadline(self, item, mask, now):
+    # once released the entry is due at the earliest deadline, a write after
+    # the close does not hold it again
+    if item[1] & self.release_mask:
+      return now if item[6] is None else min(item[6], now)
+
+    if item[1] & self.hold_mask:
+      return item[5] + self.hold
+
+    return min(now + self.quiet, item[5] + self.maxdelay)
+  #__next_deadline
+
+  def timeout(self, now=None):
+    """
+      seconds until the next entry may be due, None if nothing is pending
+    """
+    if not self.__deadline:
+      return None
+
+    now = now if now is not None else monotonic()
+    return max(0, self.__deadline[0][0] - now)
+  #timeout
+
+  def due(self, now=None):
+    """
+      yield (entry, mask, flag, event, count) of the entries due at now
+    """
+    now = now if now is not None else monotonic()
+
+    while self.__deadline and self.__deadline[0][0] <= now:
+      deadline, key = heappop(self.__deadline)
+
+      item = self.__pending.get(key)
+      if not item:
+        continue
+
+      if item[6] > deadline:
+        heappush(self.__deadline, (item[6], key))
+        continue
+
+      del self.__pending[key]
+      yield tuple(item[:5])
+    #endwhile
+  #due
+
+  def flush(self):
+    pending = list(self.__pending.values())
+    self.__pending.clear()
+    self.__deadline.clear()
+
+    for item in pending:
+      yield tuple(item[:5])
+  #flush
+#class FSCoalescer
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+#
+# ./fs/crypto.py
+#
+# Score of crypto activity (mining, encryption) of the processes
+#
+from collections import deque
+from time        import monotonic
+
+from fs.procstats import ProcCPU
+
+
+class CryptoActivity(object):
+  """
+    Scores the busiest processes of ProcCPU with signals cheap to read:
+      - name of a known miner                       +3
+      - cpu saturated for `sustained` samples       +2 (+1 if only now)
+      - high entropy writes seen by FSWatcher while
+        the process saturates a cpu                 +2
+    A score from `warning` is a warning, from `critical` critical.
+  """
+
+  names = ('xmrig', 'xmr-stak', 'minerd', 'cpuminer', 'cgminer', 'bfgminer',
+           'ccminer', 'ethminer', 'nheqminer', 'lolminer', 'nbminer', 't-rex',
+           'phoenixminer', 'teamredminer', 'srbminer', 'kdevtmpfsi', 'kinsing')
+
+  entropy = 7.5   # bits per byte of a high entropy write
+  window  = 10    # seconds the high entropy writes are counted
+
+  __writes = deque(maxlen=65536)  # monotonic time of every high entropy write
+
+  def __init__(self, top=5, saturation=90.0, sustained=5, writes=10,
+                     warning=3, critical=5, scan_every=10, quiet=60):
+    """
+      param: top         busiest processes scored every sample
+      param: saturation  % of one cpu per thread of a saturated process
+      param: sustained   consecutive saturated samples
+      param: writes      high entropy writes in `window` seconds
+      param: scan_every  samples between two full scans of /proc
+      param: quiet       seconds without a new alert of the same pid
+    """
+    self.procs      = ProcCPU(top, saturation=saturation)
+    self.saturation = saturation
+    self.sustained  = sustained
+    self.writes     = writes
+    self.warning    = warning
+    self.critical   = critical
+    self.scan_every = scan_every
+    self.quiet      = quiet
+
+    self.__samples = 0
+    self.__alerted = {}  # pid -> monotonic time of the last alert
+  #__init__
+
+  @classmethod
+  def written(cls, entropy, now=None):
+    """
+      called by the verifiers for every modified file, thread safe
+    """
+    if entropy >= cls.entropy:
+      cls.__writes.append(now or monotonic())
+  #written
+
+  @classmethod
+  def recent_writes(cls, now=None):
+    """
+      return: high entropy writes in the last `window` seconds
+    """
+    now    = now or monotonic()
+    writes = cls.__writes
+    while writes and writes[0] < now - cls.window:
+      writes.popleft()
+
+    return len(writes)
+  #recent_writes
+
+  def check(self, busy=True):
+    """
+      param: busy  a cpu is above its warning, the full scans of /proc are
+                   every scan_every samples while busy and every 6 times
+                   scan_every otherwise
+
+      return: list of tuple(log level, message)
+    """
+    every = self.scan_every if busy else self.scan_every * 6
+    full  = self.__samples % max(every, 1) == 0
+
+    self.procs.sample(full=full)
+    self.__samples += 1
+
+    now    = monotonic()
+    writes = self.recent_writes(now)
+    alerts = []
+    for entry in self.procs.top():
+      score, reasons = self.score(entry, writes)
+      if score < self.warning:
+        continue
+
+      if now - self.__alerted.get(entry.pid, -self.quiet) < self.quiet:
+        continue
+
+      self.__alerted[entry.pid] = now
+      alerts.append((-3 if score >= self.critical else -2,
+                     f'crypto activity {entry.comm}[{entry.pid}], score {score}: {", ".join(reasons)}'))
+    #endfor
+
+    for pid in self.__alerted.keys() - self.procs.pids.keys():
+      del self.__alerted[pid]
+
+    return alerts
+  #check
+
+  def score(self, entry, writes=0):
+    """
+      return: tuple(score, list of reasons)
+    """
+    score, reasons = (0, [])
+
+    name = (entry.comm or '').lower()
+    if any(x in name for x in self.names):
+      score += 3
+      reasons.append(f'name {entry.comm}')
+    #endif
+
+    saturated = entry.load >= self.saturation
+    if entry.streak >= self.sustained:
+      score += 2
+      reasons.append(f'{entry.cpu}% cpu ({entry.threads} threads) for {entry.streak} samples')
+    elif saturated:
+      score += 1
+      reasons.append(f'{entry.cpu}% cpu ({entry.threads} threads)')
+    #endif
+
+    if saturated and writes >= self.writes:
+      score += 2
+      reasons.append(f'{writes} high entropy writes in {self.window} s')
+
+    return score, reasons
+  #score
+#class CryptoActivity
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+#
+# ./fs/fanotify.py
+#
+# Binding fanotify function from libc, watcher of whole filesystems
+#
+import os
+
+from collections import OrderedDict
+from ctypes import CDLL, CFUNCTYPE, get_errno, \
+                   c_char_p, c_int, c_uint, c_uint64
+from struct import Struct
+
+from fs.inotify  import *
+from fs.registry import FSWatch
+from fs.monitor  import FSWatcher, FSWatcherError, stage_parse, stage_handler
+from utils       import profiler
+
+libc = CDLL('libc.so.6')
+
+fanotify_init = CFUNCTYPE(c_int, c_uint, c_uint, use_errno=True)(
+  ('fanotify_init', libc),
+)
+
+fanotify_mark = CFUNCTYPE(c_int, c_int, c_uint, c_uint64, c_int, c_char_p, use_errno=True)(
+  ('fanotify_mark', libc),
+)
+
+open_by_handle_at = CFUNCTYPE(c_int, c_int, c_char_p, c_int, use_errno=True)(
+  ('open_by_handle_at', libc),
+)
+
+# Define constants
+## Ref. https://github.com/torvalds/linux/blob/master/include/uapi/linux/fanotify.h
+## the events have the same values as IN_* in inotify.h
+FAN_Q_OVERFLOW = 0x00004000      # Event queued overflowed
+FAN_ONDIR      = 0x40000000      # Event occurred against dir
+
+## fanotify_init flags
+FAN_CLOEXEC          = 0x00000001
+FAN_NONBLOCK         = 0x00000002
+FAN_CLASS_NOTIF      = 0x00000000
+FAN_REPORT_FID       = 0x00000200  # Report unique file id
+FAN_REPORT_DIR_FID   = 0x00000400  # Report unique directory id
+FAN_REPORT_NAME      = 0x00000800  # Report events with name
+FAN_REPORT_DFID_NAME = (FAN_REPORT_DIR_FID | FAN_REPORT_NAME)
+
+## fanotify_mark flags
+FAN_MARK_ADD        = 0x00000001
+FAN_MARK_REMOVE     = 0x00000002
+FAN_MARK_MOUNT      = 0x00000010
+FAN_MARK_FILESYSTEM = 0x00000100
+
+# events of directory entries, always marked: the moves and deletes of
+# directories drop their paths from the handle cache
+FAN_DIR_EVENTS = (IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO)
+
+FAN_EVENTS = (IN_ACCESS | IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | \
+              IN_CLOSE_NOWRITE | IN_OPEN | IN_MOVED_FROM | IN_MOVED_TO | \
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+## info records
+FAN_EVENT_INFO_TYPE_FID      = 1
+FAN_EVENT_INFO_TYPE_DFID_NAME = 2
+FAN_EVENT_INFO_TYPE_DFID     = 3
+
+FAN_NOFD  = -1
+AT_FDCWD  = -100
+
+# struct fanotify_event_metadata, struct fanotify_event_info_header + fsid,
+# struct file_handle header
+EVENT_METADATA = Struct('IBBHQii')
+EVENT_INFO     = Struct('BBHii')
+FILE_HANDLE    = Struct('Ii')
+
+
+class FSFanotifyWatcher(FSWatcher):
+  """
+    FSWatcher on fanotify, one mark for the filesystem (or mount) of every
+    root instead of one inotify watch per directory. The kernel reports the
+    directory handle and the name, events outside the roots are filtered
+    here.
+  """
+
+  cache_size = 4096  # directory handles resolved to paths
+
+  def __init__(self, extensions=[], mark=FAN_MARK_FILESYSTEM, **kwargs):
+    fd = fanotify_init(FAN_CLASS_NOTIF | FAN_CLOEXEC | FAN_NONBLOCK | FAN_REPORT_DFID_NAME,
+                       os.O_RDONLY | os.O_LARGEFILE)
+    if fd == -1:
+      errno = get_errno()
+      raise FSWatcherError(errno, strerror(errno))
+
+    self.mark     = mark
+    self.__roots  = []   # FSWatch of every root
+    self.__mounts = {}   # fsid -> fd of a directory in that filesystem
+    self.__dirs   = OrderedDict()  # directory handle -> path, least recently used first
+    self.__pid    = os.getpid()
+
+    FSWatcher.__init__(self, extensions, fd=fd, **kwargs)
+  #__init__
+
+  def __del__(self):
+    for fd in self.__mounts.values():
+      os.close(fd)
+
+    FSWatcher.__del__(self)
+  #__del__
+
+  def add_event(self, path, flags=IN_ALL_EVENTS, wd_parent=0, iflags=0):
+    path = path if isinstance(path, bytes) else path.encode()
+    path = path.rstrip(b'/') or b'/'
+
+    # only the selected events and the directory entry events, an access or
+    # open on the whole filesystem is not queued
+    mask = (flags & FAN_EVENTS) | FAN_DIR_EVENTS | FAN_ONDIR
+    ret  = fanotify_mark(self.fileno(), FAN_MARK_ADD | self.mark, mask, AT_FDCWD, path)
+
+    self.logger.log((-1, f'new fanotify mark -> path {path}'))
+
+    if ret == -1:
+      errno = get_errno()
+      raise FSWatcherError(errno, strerror(errno))
+
+    fsid = os.statvfs(path).f_fsid
+    if fsid not in self.__mounts:
+      self.__mounts[fsid] = os.open(path, os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC)
+
+    watch = FSWatch(-(len(self.__roots) + 1), path, wd_parent, flags)
+    self.__roots.append(watch)
+
+    return watch
+  #add_event
+
+  def _events(self, view, size):
+    offset = 0
+    while offset + EVENT_METADATA.size <= size:
+      length, vers, _, metadata_len, mask, fd, pid = EVENT_METADATA.unpack_from(view, offset)
+      if length < EVENT_METADATA.size:
+        break
+
+      info, offset = (offset + metadata_len, offset + length)
+      start = profiler.start()
+
+      if fd >= 0:
+        os.close(fd)
+
+      self.events_counter.inc()
+
+      if mask & FAN_Q_OVERFLOW:
+        self.overflows += 1
+        self.overflows_counter.inc()
+        yield (-2, f'fanotify queue overflow, events lost ({self.overflows})')
+        continue
+      #endif
+
+      if pid == self.__pid:
+        continue # own reads (hash, entropy)
+
+      entry, name = self.__resolve(view, info, offset)
+      if not entry:
+        continue
+
+      if mask & FAN_ONDIR:
+        if mask & IN_MOVED_FROM or mask & IN_DELETE or mask & IN_MOVE_SELF:
+          self.__forget(entry) # cached paths below it are no longer valid
+        continue
+      #endif
+
+      if name and not self._check_extension_file(name):
+        continue
+
+      root = self.__root(entry)
+      if not root:
+        continue
+
+      flag = mask & root.flags
+      if not flag:
+        continue
+
+      entry = entry.decode()
+      self.logger.debug(f'read_events: pid {pid}, entry {entry}, mask {hex(mask)}')
+      profiler.stop(stage_parse, start)
+
+      start  = profiler.start()
+      result = self._submit(entry, entry, mask, flag, root)
+      profiler.stop(stage_handler, start)
+      if result:
+        yield result
+    #endwhile
+  #_events
+
+  def __resolve(self, view, offset, end):
+    """
+      path of the first directory handle + name record in view[offset:end]
+
+      return: (path, name) as bytes, (None, None) when it cannot be opened
+    """
+    while offset + EVENT_INFO.size <= end:
+      info_type, _, length, fsid0, fsid1 = EVENT_INFO.unpack_from(view, offset)
+      if length == 0:
+        break
+
+      record, offset = (offset, offset + length)
+      if info_type not in (FAN_EVENT_INFO_TYPE_DFID_NAME, FAN_EVENT_INFO_TYPE_DFID,
+                           FAN_EVENT_INFO_TYPE_FID):
+        continue
+
+      handle_bytes, _ = FILE_HANDLE.unpack_from(view, record + EVENT_INFO.size)
+      start  = record + EVENT_INFO.size
+      handle = view[start: start + FILE_HANDLE.size + handle_bytes].tobytes()
+
+      name = b''
+      if info_type == FAN_EVENT_INFO_TYPE_DFID_NAME:
+        name = view[start + len(handle): offset].tobytes().split(b'\0', 1)[0]
+        name = b'' if name == b'.' else name
+
+      fsid = (fsid0 & 0xffffffff) | (fsid1 & 0xffffffff) << 32
+      path = self.__directory(fsid, handle)
+      if path is None:
+        return None, None
+
+      return (os.path.join(path, name) if name else path), name
+    #endwhile
+
+    return None, None
+  #__resolve
+
+  def __directory(self, fsid, handle):
+    path = self.__dirs.get(handle)
+    if path is not None:
+      self.__dirs.move_to_end(handle)
+      return path
+
+    mount = self.__mounts.get(fsid)
+    if mount is None:
+      return None
+
+    fd = open_by_handle_at(mount, handle, os.O_PATH)
+    if fd == -1:
+      return None
+
+    try:
+      path = os.readlink(f'/proc/self/fd/{fd}').encode()
+    finally:
+      os.close(fd)
+
+    if len(self.__dirs) >= self.cache_size:
+      self.__dirs.popitem(last=False)
+
+    self.__dirs[handle] = path
+    return path
+  #__directory
+
+  def __forget(self, path):
+    """
+      drop the cached paths of a directory moved or deleted and of its
+      subdirectories
+    """
+    prefix = path.rstrip(b'/') + b'/'
+    for handle in [ k for k, v in self.__dirs.items() if v == path or v.startswith(prefix) ]:
+      del self.__dirs[handle]
+  #__forget
+
+  def __root(self, path):
+    for root in self.__roots:
+      if path == root.path or path.startswith(root.path.rstrip(b'/') + b'/'):
+        return root
+    #endfor
+  #__root
+#class FSFanotifyWatcher
@@ -8,7 +8,7 @@
 #
 from ctypes import CDLL, CFUNCTYPE, \
                    c_char_p, c_int, c_uint32
-from struct import unpack_from
+from struct import Struct, unpack_from
 
 libc = CDLL('libc.so.6')
 
@@ -62,6 +62,10 @@ IN_MASK_ADD    = 0x20000000	     # add to the mask of an already existing watch
 IN_ISDIR       = 0x40000000	     # event occurred against dir
 IN_ONESHOT     = 0x80000000	     # only send event once
 
+# struct inotify_event without the name, followed by len bytes of name
+# padded with \0
+EVENT_HEADER = Struct('iIII')
+
 IN_ALL_EVENTS = (IN_ACCESS | IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | \
                  IN_CLOSE_NOWRITE | IN_OPEN | IN_MOVED_FROM | \
                  IN_MOVED_TO | IN_DELETE | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF)
@@ -91,7 +95,7 @@ class FSEvent(object):
       __MoveFrom   : 'move from',
       __MoveTo     : 'move to',
       __Open       : 'open',
-      __Close_WR   : 'closed',
+      __Close_WR   : 'close write',
       __Close_NOWR : 'closed',
   }
 
@@ -112,7 +116,7 @@ class FSEvent(object):
   def parse(b):
     offset, by = (0, 16)
 
-    while offset + by < len(b):
+    while offset + by <= len(b):
       wd, mask, cookie, length = unpack_from('iIII', b, offset)
       name = b[offset + by: offset + by + length].rstrip(b'\0')
 
@@ -120,6 +124,40 @@ class FSEvent(object):
       yield wd, mask, cookie, name
   #parse
 
+  def decode(view, size):
+    """
+      param: view  memoryview over the buffer filled by readinto
+      param: size  bytes read
+
+      yield wd, mask, cookie, offset and length of the name in view, nothing
+      is copied, see FSEvent.filename
+    """
+    unpack, by, offset = (EVENT_HEADER.unpack_from, EVENT_HEADER.size, 0)
+
+    while offset + by <= size:
+      wd, mask, cookie, length = unpack(view, offset)
+      offset += by
+
+      yield wd, mask, cookie, offset, length
+      offset += length
+    #endwhile
+  #decode
+
+  def filename(view, offset, length):
+    """
+      bytes of the name at view[offset:offset + length] without \0 padding
+    """
+    return view[offset: offset + length].tobytes().rstrip(b'\0')
+  #filename
+
+  def verify_on_close(self, flags):
+    """
+      verification policy, with 'close write' in -events a modified file is
+      verified when it is closed instead of on every IN_MODIFY
+    """
+    return bool(flags & self.__Close_WR)
+  #verify_on_close
+
   def get_flags(self, action_names):
     flags = self.__All
 
@@ -135,7 +173,18 @@ class FSEvent(object):
 
   @property
   def events_name(self):
-    return self.__events_name.get(self.action)
+    name = self.__events_name.get(self.action)
+    if name is None:  # events merged by FSCoalescer
+      names = []
+      for flag, map in self.__events_name.items():
+        if self.action & flag and map not in names:
+          names.append(map)
+      #endfor
+
+      name = ', '.join(names)
+    #endif
+
+    return name
 
   @property
   def path(self):
@@ -7,15 +7,88 @@
 import os, sys
 import hashlib
 
-from time import time, sleep
+from time            import time, sleep, perf_counter_ns
+from collections     import deque
+from multiprocessing import Pool
 
 from utils import *
 
+# files and bytes hashed by this process, the results of the worker
+# processes of run() are counted when they arrive
+hashed_files = metrics_registry.counter('integrity_hashed_files', 'files hashed')
+hashed_bytes = metrics_registry.counter('integrity_hashed_bytes', 'bytes hashed')
+
+# ns per file of the digest and the histogram, and per database lookup
+stage_hash    = profiler.stage('hash')
+stage_entropy = profiler.stage('entropy')
+stage_sqlite  = profiler.stage('sqlite')
+
 
 class FSIntegrity(object):
 
-  basepath = os.path.dirname(os.path.abspath(sys.argv[0]))
-  buffer   = 65535
+  basepath  = os.path.dirname(os.path.abspath(sys.argv[0]))
+  buffer    = 1024 * 1024
+  chunksize = 64   # paths per task sent to a worker process
+  pending   = 4    # chunks in flight per worker process
+  progress_interval = 5  # seconds between progress lines
+
+  # block hash tree of the files from block_min bytes, a leaf per block of
+  # block_size. None disables it, 'ranges' reads the whole file and reports
+  # every changed range, 'verdict' stops at the first changed block
+  blocks          = None
+  block_size      = 1024 * 1024   # multiple of the page size, reads stay aligned
+  block_min       = 64 * 1024 * 1024
+  block_algorithm = 'blake2b'
+
+  # digest of a leaf and of a node of the tree
+  algorithms = {
+    'blake2b': lambda: hashlib.blake2b(digest_size=32),
+    'blake2s': hashlib.blake2s,
+    'sha256': hashlib.sha256,
+    'sha1': hashlib.sha1
+  }
+
+  # PRAGMA user_version of the database, 0 is the first layout (hex strings)
+  schema = 4
+
+  __table__ = """
+CREATE TABLE `sys_integrity` (
+`uid`               BLOB PRIMARY KEY NOT NULL,
+`path`              BLOB,
+`hash`              BLOB NOT NULL,
+`date`              INTEGER,
+`updated`           DATETIME DEFAULT CURRENT_TIMESTAMP,
+`size`              INTEGER,
+`mtime_ns`          INTEGER,
+`ino`               INTEGER,
+`ctime_ns`          INTEGER
+) WITHOUT ROWID;
+  """
+
+  __table_v2__ = """
+CREATE TABLE `sys_integrity` (
+`uid`               BLOB PRIMARY KEY NOT NULL,
+`path`              BLOB,
+`hash`              BLOB NOT NULL,
+`date`              INTEGER,
+`updated`           DATETIME DEFAULT CURRENT_TIMESTAMP
+) WITHOUT ROWID;
+  """
+
+  # leaves is the concatenation of the digests of the blocks, root the
+  # merkle root of the leaves
+  __table_blocks__ = """
+CREATE TABLE IF NOT EXISTS `sys_blocks` (
+`uid`               BLOB PRIMARY KEY NOT NULL,
+`algorithm`         TEXT NOT NULL,
+`block_size`        INTEGER NOT NULL,
+`size`              INTEGER NOT NULL,
+`root`              BLOB NOT NULL,
+`leaves`            BLOB NOT NULL
+);
+  """
+
+  __stat__ = ('size', 'mtime_ns', 'ino', 'ctime_ns')
 
   def __init__(self, initializedb=False, updatedb=True):
     self.database = f'{self.basepath}/.fs-integrity.sqlite3'
@@ -29,53 +102,347 @@ class FSIntegrity(object):
     if not self.__check_if_table_exists__():
       raise FSIntegrityError(-1, 'ERROR: Integrity database not initialize')
 
-    if not initializedb:
-      count = self.count()
-      if not count:
-        raise FSIntegrityError(-1, 'ERROR: Integrity database not initialize')
-    #endif
+    self.__migrate__()
+
+    if not initializedb and self.empty():
+      raise FSIntegrityError(-1, 'ERROR: Integrity database not initialize')
   #__init__
 
-  def run(self, path):
-    paths = [ x for x in explore(path) ]
-    while True:
-      if len(paths) == 0:
-        break #endwhile
+  def run(self, path, jobs=1, paranoid=False):
+    """
+      Hash every file under path and store it. With jobs > 1 the files are
+      hashed by a pool of worker processes while this process is the only
+      writer, paths are read lazily and at most jobs * pending chunks are in
+      flight, so memory does not grow with the size of the tree.
+
+      Files whose (size, mtime_ns, ino, ctime_ns) match the stored values
+      are not hashed again, unless paranoid is set. With blocks, the files
+      from block_min bytes store their block hash tree in the same pass.
+    """
+    start = last = time()
+    files = size = 0
+    self.unchanged = 0
+
+    paths = self.__changed__(explore(path), paranoid)
+    for filepath, digest, filesize, stat, tree in self.__hash_files__(paths, jobs):
+      self.__add__(filepath.encode(), digest, stat)
+      self.logger.debug(f'{filepath} {digest.hex()}')
+
+      if tree:
+        self.__add_blocks__(filepath.encode(), filesize, *tree)
+
+      files += 1
+      size  += filesize
+
+      if time() - last >= self.progress_interval:
+        last = time()
+        self.__progress__(path, files, size, last - start)
+    #endfor
+
+    self.conn.flush()
+    self.__progress__(path, files, size, time() - start)
+  #run
 
-      filepath = paths.pop()
-      if not os.path.isfile(filepath):
-        self.logger.debug(f'ignore file {filepath}')
+  def __changed__(self, paths, paranoid=False):
+    for filepath in paths:
+      memory_governor.wait() # the baseline scan pauses over the memory limit
+
+      if paranoid:
+        yield filepath
         continue
 
-      hash = self.hash(filepath)
+      try:
+        st = os.stat(filepath)
+      except OSError:
+        continue
 
-      self.__add__(filepath.encode(), hash)
-      self.logger.debug(f'{filepath} {hash}')
-    #endwhile
-  #run
+      info = self.get(filepath.encode())
+      if info and tuple(info[k] for k in self.__stat__) == stat_tuple(st) and \
+         not self.__missing_tree__(filepath.encode(), st.st_size):
+        self.unchanged += 1
+        continue
+
+      yield filepath
+    #endfor
+  #__changed__
+
+  def __hash_files__(self, paths, jobs=1):
+    chunks = chunked(paths, self.chunksize)
+
+    if jobs <= 1:
+      for chunk in chunks:
+        yield from _hash_files(chunk)
+      return
+    #endif
+
+    with Pool(jobs) as pool:
+      inflight = deque()
+      for chunk in chunks:
+        inflight.append(pool.apply_async(_hash_files, (chunk,)))
+
+        if len(inflight) >= jobs * self.pending:
+          yield from _counted(inflight.popleft().get())
+      #endfor
+
+      while len(inflight) > 0:
+        yield from _counted(inflight.popleft().get())
+    #endwith
+  #__hash_files__
+
+  def __progress__(self, path, files, size, elapsed):
+    elapsed = elapsed if elapsed > 0 else 1e-9
+    mb      = size / 1024 / 1024
+
+    self.logger.log((-1, f'integrity {path}, {files} files {round(mb, 2)} MB, ' + \
+                         f'{round(files / elapsed, 2)} files/s {round(mb / elapsed, 2)} MB/s, ' + \
+                         f'{self.unchanged} unchanged'))
+  #__progress__
 
   def hash(self, filepath):
+    result = self.scan(filepath, entropy=False)
+
+    return result.hash if result else None
+  #hash
+
+  @classmethod
+  def scan(cls, filepath, digest=True, entropy=True, buffer=None):
+    """
+      Stream the file once, feeding every chunk to the SHA-256 digest and
+      to the byte histogram. The entropy of a file larger than
+      entropy_sampler.exact is sampled, without digest the file is not
+      streamed at all.
+
+      return: ToObject(hash, digest, entropy, confidence, size, stat) or None
+              if filepath is not a file, hash is the hex string of digest,
+              confidence 1.0 unless the entropy was sampled and stat the
+              fstat taken before reading
+    """
     if not os.path.isfile(filepath):
       return
 
-    hash = hashlib.sha256()
+    hash      = hashlib.sha256() if digest else None
+    histogram = ByteHistogram() if entropy else None
+    buffer    = buffer if buffer is not None else bytearray(cls.buffer)
+    view      = memoryview(buffer)
+    size      = 0
+    timing    = [ 0, 0 ] if profiler.enabled else None  # ns of hash and histogram
+    sampled   = None
+
     with open(filepath, 'rb') as fr:
-      while True:
-        data = fr.read(self.buffer)
-        if not data:
+      stat = os.fstat(fr.fileno())
+
+      if entropy and stat.st_size > entropy_sampler.exact:
+        sampled   = shannon_entropy(fr, sample=True)
+        histogram = None
+      #endif
+
+      if not (hash or histogram):
+        size = stat.st_size # nothing to stream
+
+      while hash or histogram:
+        n = fr.readinto(buffer)
+        if not n:
           break
 
-        hash.update(data)
+        if timing is None:
+          if hash:      hash.update(view[:n])
+          if histogram: histogram.update(view[:n])
+        else:
+          start = perf_counter_ns()
+          if hash:      hash.update(view[:n])
+          split = perf_counter_ns()
+          if histogram: histogram.update(view[:n])
+
+          timing[0] += split - start
+          timing[1] += perf_counter_ns() - split
+        #endif
+
+        size += n
       #endwhile
-      fr.flush()
 
-    return hash.hexdigest()
-  #hash
+    if hash:
+      hashed_files.inc()
+      hashed_bytes.inc(size)
+
+    if timing is not None:
+      if hash:      stage_hash.observe(timing[0])
+      if histogram: stage_entropy.observe(timing[1])
+    #endif
+
+    return ToObject(**{
+      'hash': hash.hexdigest() if hash else None,
+      'digest': hash.digest() if hash else None,
+      'entropy': histogram.entropy if histogram else (sampled[0] if sampled else None),
+      'confidence': 1.0 if histogram else (sampled[1] if sampled else None),
+      'size': size,
+      'stat': stat
+    })
+  #scan
+
+  @classmethod
+  def scan_blocks(cls, filepath, stored=None, stop=False, digest=True, entropy=True):
+    """
+      Read the file in aligned blocks of block_size, every block is a leaf
+      of the tree, and feed the whole file digest in the same pass. With
+      stored (row of sys_blocks) the leaves are compared while reading, the
+      histogram only counts the changed blocks and with stop the read ends
+      at the first changed block. A file of another size is read up to its
+      first changed block too (the last block of the shorter one at the
+      latest), changed only holds ranges compared with the stored leaves.
+
+      The file is not mapped: a file truncated while it is read would kill
+      the process with SIGBUS.
+
+      return: ToObject(hash, digest, entropy, size, stat, root, leaves,
+              changed, complete) or None if filepath is not a file. changed
+              is the list of (start, end) byte ranges, None without stored.
+              digest and root are None when the read stopped early
+    """
+    if not os.path.isfile(filepath):
+      return
+
+    new       = cls.algorithms[cls.block_algorithm]
+    hash      = hashlib.sha256() if digest else None
+    histogram = ByteHistogram() if entropy else None
+    leaves    = []
+    changed   = None
+    old       = None   # stored leaves, only if they were made with the same settings
+    complete  = True
+
+    if stored and stored['algorithm'] == cls.block_algorithm and stored['block_size'] == cls.block_size:
+      old, changed = (stored['leaves'], [])
+
+    with open(filepath, 'rb', buffering=0) as fr:
+      stat = os.fstat(fr.fileno())
+      size = stat.st_size
+      os.posix_fadvise(fr.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+      for offset, block in cls.__read_blocks__(fr):
+        leaf = new()
+        leaf.update(b'\0')
+        leaf.update(block)
+        leaf = leaf.digest()
+        leaves.append(leaf)
+
+        if hash:
+          hash.update(block)
+
+        n, end = (len(leaves) - 1, offset + len(block))
+        differs = old is not None and old[n * len(leaf): (n + 1) * len(leaf)] != leaf
+        if differs:
+          if changed and changed[-1][1] == offset:
+            changed[-1] = (changed[-1][0], end)
+          else:
+            changed.append((offset, end))
+        #endif
+
+        if histogram and (old is None or differs):
+          histogram.update(block)
+
+        if differs and stop:
+          complete = False
+          break
+      #endfor
+    #endwith
+
+    # blocks stored after the end of a truncated file, every leaf was read
+    if complete and old is not None and stored['size'] > size:
+      if changed and changed[-1][1] == size:
+        changed[-1] = (changed[-1][0], stored['size'])
+      else:
+        changed.append((size, stored['size']))
+    #endif
+
+    if hash and complete:
+      hashed_files.inc()
+      hashed_bytes.inc(size)
+
+    return ToObject(**{
+      'hash': hash.hexdigest() if hash and complete else None,
+      'digest': hash.digest() if hash and complete else None,
+      'entropy': histogram.entropy if histogram else None,
+      'size': size,
+      'stat': stat,
+      'root': cls.merkle_root(leaves) if complete else None,
+      'leaves': b''.join(leaves) if complete else None,
+      'changed': changed,
+      'complete': complete
+    })
+  #scan_blocks
+
+  @classmethod
+  def __read_blocks__(cls, fr):
+    """
+      yield (offset, memoryview) of every block, read(2) of block_size into
+      one buffer, the last block can be shorter
+    """
+    buffer = bytearray(cls.block_size)
+    view   = memoryview(buffer)
+    offset = 0
+
+    while True:
+      n = 0
+      while n < cls.block_size:
+        read = fr.readinto(view[n:])
+        if not read:
+          break
+
+        n += read
+      #endwhile
+
+      if not n:
+        break
+
+      yield offset, view[:n]
+      offset += n
+    #endwhile
+  #__read_blocks__
+
+  @classmethod
+  def merkle_root(cls, leaves):
+    """
+      param: leaves  list of digests
+
+      return: root of the tree, node = H(1 || left || right), an odd node
+              goes up as it is
+    """
+    new   = cls.algorithms[cls.block_algorithm]
+    level = leaves or [ new().digest() ]
+
+    while len(level) > 1:
+      nodes = []
+      for n in range(0, len(level) - 1, 2):
+        node = new()
+        node.update(b'\1' + level[n] + level[n + 1])
+        nodes.append(node.digest())
+      #endfor
+
+      if len(level) % 2:
+        nodes.append(level[-1])
+
+      level = nodes
+    #endwhile
+
+    return level[0]
+  #merkle_root
+
+  @staticmethod
+  def ranges(changed, limit=8):
+    """
+      return: changed byte ranges as text, `start-end` with end included
+    """
+    out = ', '.join(f'{start}-{end - 1}' for start, end in changed[:limit])
+    if len(changed) > limit:
+      out += f' and {len(changed) - limit} more'
+
+    return out
+  #ranges
 
-  def validate(self, fullpath):
+  def validate(self, fullpath, scan=None):
+    scan = scan if scan else self.scan(fullpath, entropy=False)
     self.get(fullpath)
 
-    return self.conn.result and self.conn.result['hash'] == self.hash(fullpath)
+    return self.conn.result and scan and self.conn.result['hash'] == scan.digest
   #validate
 
   def remove(self, fullpath):
@@ -83,13 +450,53 @@ class FSIntegrity(object):
   #remove
 
   def get(self, fullpath):
-    sql = 'SELECT * FROM sys_integrity WHERE uid = ? LIMIT 1'
+    sql   = 'SELECT * FROM sys_integrity WHERE uid = ? LIMIT 1'
+    start = profiler.start()
 
-    self.conn.fetchone((sql, (hashlib.sha256(fullpath).hexdigest(),)))
+    self.conn.fetchone((sql, (self.uid(fullpath),)))
+    profiler.stop(stage_sqlite, start)
 
     return self.conn.result
   #get
 
+  def get_blocks(self, fullpath):
+    """
+      return: row of sys_blocks of fullpath, None if it has no tree
+    """
+    sql   = 'SELECT * FROM sys_blocks WHERE uid = ? LIMIT 1'
+    start = profiler.start()
+
+    self.conn.fetchone((sql, (self.uid(fullpath),)))
+    profiler.stop(stage_sqlite, start)
+
+    return self.conn.result
+  #get_blocks
+
+  def __missing_tree__(self, fullpath, size):
+    """
+      True if the file should have a tree and has none, or one made with
+      another algorithm or block size
+    """
+    if not self.blocks or size < self.block_min:
+      return False
+
+    sql = 'SELECT algorithm, block_size FROM sys_blocks WHERE uid = ? LIMIT 1'
+    self.conn.fetchone((sql, (self.uid(fullpath),)))
+
+    row = self.conn.result
+    return not (row and row['algorithm'] == self.block_algorithm and row['block_size'] == self.block_size)
+  #__missing_tree__
+
+  def uid(self, fullpath):
+    return hashlib.sha256(fullpath).digest()
+  #uid
+
+  def empty(self):
+    self.conn.fetchone('SELECT 1 AS found FROM sys_integrity LIMIT 1')
+
+    return not self.conn.result
+  #empty
+
   def count(self):
     sql = "SELECT COUNT(*) as counter FROM sys_integrity"
     self.conn.fetchone(sql)
@@ -97,28 +504,30 @@ class FSIntegrity(object):
     return self.conn.result if not self.conn.result else self.conn.result['counter']
   #count
 
-  def __add__(self, fullpath, hash):
-    tm = int(time())
-    self.get(fullpath)
-
-    if self.conn.result and self.conn.result['id']:  # Update
-      if self.conn.result['hash'] == hash:
-        return
+  def __add__(self, fullpath, digest, stat=(None, None, None, None)):
+    sql  = 'INSERT INTO sys_integrity (`uid`, `path`, `hash`, `date`, ' + \
+           '`size`, `mtime_ns`, `ino`, `ctime_ns`) VALUES (?, ?, ?, ?, ?, ?, ?, ?) ' + \
+           'ON CONFLICT(`uid`) DO UPDATE SET `hash` = excluded.`hash`, ' + \
+           '`date` = CASE WHEN `hash` != excluded.`hash` THEN excluded.`date` ELSE `date` END, ' + \
+           '`size` = excluded.`size`, `mtime_ns` = excluded.`mtime_ns`, ' + \
+           '`ino` = excluded.`ino`, `ctime_ns` = excluded.`ctime_ns`'
+    vals = (self.uid(fullpath), fullpath, digest, int(time())) + tuple(stat)
 
-      sql  = 'UPDATE sys_integrity SET hash = ?, date = ? WHERE id = ?'
-      vals = (hash, tm, self.conn.result['id'])
+    self.conn.append((sql, vals))
+  #__add__
 
-    else:
-      sql  = 'INSERT INTO sys_integrity (`uid`, `path`, `hash`, `date`) ' + \
-             'VALUES (?, ?, ?, ?)'
-      vals = (hashlib.sha256(fullpath).hexdigest(), fullpath, hash, tm)
+  def __add_blocks__(self, fullpath, size, root, leaves):
+    sql  = 'INSERT OR REPLACE INTO sys_blocks (`uid`, `algorithm`, `block_size`, `size`, ' + \
+           '`root`, `leaves`) VALUES (?, ?, ?, ?, ?, ?)'
+    vals = (self.uid(fullpath), self.block_algorithm, self.block_size, size, root, leaves)
 
-    self.conn.insert((sql, vals))
-  #__add__
+    self.conn.append((sql, vals))
+  #__add_blocks__
 
   def __initialize__(self):
     self.logger.debug(f'initialize, database file -> {self.database}')
     self.conn = dbSQLite(self.database)
+    self.conn.tune()
   #__initialize__
 
   def __initilize_database__(self):
@@ -129,21 +538,14 @@ class FSIntegrity(object):
       if question.lower() == 'y':
         sql = "DROP TABLE sys_integrity"
         self.conn.insert(sql)
+        self.conn.insert("DROP TABLE IF EXISTS sys_blocks")
       else:
         self.logger.halt('Cancel')
     #endif
 
-    sql = """
-CREATE TABLE `sys_integrity` (
-`id`                INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
-`uid`               VARCHAR(255) NOT NULL,
-`path`              BLOB,
-`hash`              VARCHAR(255) NOT NULL,
-`date`              DATETIME DEFAULT CURRENT_TIMESTAMP,
-`updated`           DATETIME DEFAULT CURRENT_TIMESTAMP
-);
-  """
-    self.conn.insert(sql)
+    self.conn.insert(self.__table__)
+    self.conn.insert(self.__table_blocks__)
+    self.conn.insert(f'PRAGMA user_version = {self.schema}')
   #__initilize__
 
   def __check_if_table_exists__(self):
@@ -151,9 +553,135 @@ CREATE TABLE `sys_integrity` (
     self.conn.fetchone(sql)
 
     return self.conn.result
+  #__check_if_table_exists__
+
+  def __schema_version__(self):
+    self.conn.fetchone('PRAGMA user_version')
+
+    return self.conn.result['user_version']
+  #__schema_version__
+
+  def __migrate__(self):
+    version = self.__schema_version__()
+    if version >= self.schema:
+      return
+
+    self.logger.log((-1, f'migrate {self.database} from schema {version} to {self.schema}'))
+
+    if version < 2:
+      self.__migrate_v2__()
+
+    if version < 3:
+      self.__migrate_v3__()
+
+    if version < 4:
+      self.__migrate_v4__()
+
+    self.conn.insert('VACUUM')
+  #__migrate__
+
+  def __migrate_v2__(self):
+    """
+      uid and hash from hex strings to raw 32 bytes, uid is the primary key
+      of a WITHOUT ROWID table. The copy runs in one transaction.
+    """
+    connect = self.conn.connect
+    reader  = connect.cursor()
+    sql     = 'INSERT OR REPLACE INTO sys_integrity (`uid`, `path`, `hash`, `date`) ' + \
+              'VALUES (?, ?, ?, ?)'
+
+    with connect:
+      self.conn.cur.execute('BEGIN')
+      self.conn.cur.execute('ALTER TABLE sys_integrity RENAME TO sys_integrity_v1')
+      self.conn.cur.execute(self.__table_v2__)
+
+      reader.execute('SELECT uid, path, hash, date FROM sys_integrity_v1')
+      while True:
+        rows = reader.fetchmany(self.conn.batch_size)
+        if not rows:
+          break
+
+        self.conn.cur.executemany(sql, [
+          (bytes.fromhex(r['uid']), r['path'], bytes.fromhex(r['hash']), r['date']) for r in rows
+        ])
+      #endwhile
+
+      self.conn.cur.execute('DROP TABLE sys_integrity_v1')
+      self.conn.cur.execute('PRAGMA user_version = 2')
+    #endwith
+  #__migrate_v2__
+
+  def __migrate_v3__(self):
+    """
+      stat columns, NULL until the file is hashed again
+    """
+    with self.conn.connect:
+      self.conn.cur.execute('BEGIN')
+      for column in self.__stat__:
+        self.conn.cur.execute(f'ALTER TABLE sys_integrity ADD COLUMN `{column}` INTEGER')
+
+      self.conn.cur.execute('PRAGMA user_version = 3')
+    #endwith
+  #__migrate_v3__
+
+  def __migrate_v4__(self):
+    """
+      table of the block hash trees, empty until the files are hashed again
+    """
+    with self.conn.connect:
+      self.conn.cur.execute('BEGIN')
+      self.conn.cur.execute(self.__table_blocks__)
+      self.conn.cur.execute('PRAGMA user_version = 4')
+    #endwith
+  #__migrate_v4__
 #class FSIntegrity
 
 
+def _hash_files(paths):
+  """
+    Worker process entry point, return [(path, digest, size, stat, tree), ...]
+    for the regular files in paths, tree is (root, leaves) for the files
+    with a block hash tree, None otherwise
+  """
+  out    = []
+  buffer = bytearray(FSIntegrity.buffer)
+
+  for filepath in paths:
+    try:
+      if FSIntegrity.blocks and os.path.getsize(filepath) >= FSIntegrity.block_min:
+        result = FSIntegrity.scan_blocks(filepath, entropy=False)
+      else:
+        result = FSIntegrity.scan(filepath, entropy=False, buffer=buffer)
+    except OSError:
+      result = None
+
+    if not result:
+      continue
+
+    tree = (result.root, result.leaves) if getattr(result, 'root', None) else None
+    out.append((filepath, result.digest, result.size, stat_tuple(result.stat), tree))
+  #endfor
+
+  return out
+#_hash_files
+
+
+def _counted(results):
+  """
+    results of a worker process added to the hashed counters of this one
+  """
+  hashed_files.inc(len(results))
+  hashed_bytes.inc(sum(x[2] for x in results))
+
+  return results
+#_counted
+
+
+def stat_tuple(st):
+  return (st.st_size, st.st_mtime_ns, st.st_ino, st.st_ctime_ns)
+#stat_tuple
+
+
 class FSIntegrityError(OSError, Exception):
   def __str__(self):
     return f'FSIntegrityError - [Errno {self.errno}] {self.strerror}'
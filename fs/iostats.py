@@ -8,8 +8,12 @@
 #
 import os
 
-from time  import sleep
-from utils import Logger
+from time  import sleep, monotonic
+from utils import Logger, numpy, metrics_registry, profiler
+
+from fs.iowindow  import IOWindow
+from fs.procstats import ProcIO
+from fs.crypto    import CryptoActivity
 
 
 class IOStats(object):
@@ -17,7 +21,8 @@ class IOStats(object):
   ticks = os.sysconf(os.sysconf_names['SC_CLK_TCK']) #Clock ticks per seconds
 
   # /proc/stat position of value
-  # ignore position 0 its the name of cpu
+  # ignore position 0 its the name of cpu, columns 1..9 are kept in
+  # cpu_ticks (position - 1)
   __CPU_USER    = 1
   __CPU_NICE    = 2
   __CPU_SYSTEM  = 3
@@ -28,7 +33,7 @@ class IOStats(object):
   __CPU_STEAL   = 8
   __CPU_GUEST   = 9
 
-  # /sys/block/<disk>/stat and /sys/block/<disk>/<partition>/stat position of value
+  # /proc/diskstats position of value, after major, minor and device name
   __READ_COMPLETED         = 0
   __READ_MERGED            = 1
   __SECTORS_READ           = 2
@@ -70,24 +75,82 @@ class IOStats(object):
     'sectors_written': 'wb/s'
   }
 
+  __abuse_messages__ = {
+    'rb/s': ('reading abuse', 1024, 'kB/s'),
+    'wb/s': ('writing abuse', 1024, 'kB/s'),
+    'iops': ('iops abuse', 1, 'IO/s')
+  }
+
   def __init__(self, interval=0,
                      abuse_warning=1*1024*1024,
-                     abuse_critical=10*1024*1024):
+                     abuse_critical=10*1024*1024,
+                     iops_warning=1000,
+                     iops_critical=10000,
+                     window=10,
+                     limits={},
+                     top=5,
+                     top_every=10,
+                     crypto=True):
+    """
+      param: window     samples (intervals) averaged to check the thresholds
+      param: limits     dict { device: { metric: (window, warning, critical) } }
+                        metric 'rb/s', 'wb/s' or 'iops', device '*' changes
+                        the default of every disk. Partitions are only
+                        checked when they have limits
+      param: top        processes named in the abuse alerts, 0 disables it
+      param: top_every  intervals between two reads of /proc/<pid>/io while
+                        no device is above its warning, 0 only reads them
+                        while a device is above it
+      param: crypto     score the busiest processes for crypto activity
+    """
     self.interval = interval
 
-    self.cpus  = {}
-
-    self.disks = {}
-    self.sector_size = 512
-    self.read_disks_abuse = {}
-    self.read_disks_abuse_max_counter = 10
-    self.read_disks_abuse_warning  = abuse_warning  # default 1MB
-    self.read_disks_abuse_critical = abuse_critical # default 10MB
+    self.cpus      = []    # names in /proc/stat order, 'cpu' (all cpus) first
+    self.cpu_ticks = None  # (previous, current) ticks, one row per cpu
+    self.cpu_usage = None  # % of every cpu in the last interval
+
+    self.devices      = []    # names in /proc/diskstats order, disks and partitions
+    self.device_index = {}    # name -> row of disk_stats
+    self.disks        = {}    # disk -> [ partitions ]
+    self.disk_stats   = None  # (previous, current) counters, one row per device
+    self.disk_times   = None  # (previous, current) monotonic time of disk_stats
+    self.disk_rates   = {}    # 'rb/s', 'wb/s', 'iops' -> per second of every device
+    self.sector_size  = 512   # /proc/diskstats counts 512 bytes sectors
+
+    # (window, warning, critical) of every metric, by default and by device
+    self.limits = {
+      'rb/s': (window, abuse_warning, abuse_critical), # default 1MB, 10MB
+      'wb/s': (window, abuse_warning, abuse_critical),
+      'iops': (window, iops_warning, iops_critical)
+    }
+    self.device_limits = {}
+    self.windows       = {}   # (device, metric) -> IOWindow
+
+    # /proc/<pid>/io is read every interval only while a device is above its
+    # warning, with 50k pids a read of every process is not cheap and one
+    # sample reads at most ProcIO.max_pids of them
+    self.procio    = ProcIO(top) if top > 0 else None
+    self.top_every = top_every
+    self.__top_tick = 0
+
+    self.crypto = CryptoActivity() if crypto else None
+
+    # the defaults ('*') first, device limits take the values they do not set
+    for device, metrics in sorted(limits.items(), key=lambda x: x[0] != '*'):
+      for metric, limit in metrics.items():
+        self.set_limit(None if device == '*' else device, metric, *limit)
 
     self.terminate = False
     self.logger = Logger()
 
     self.__initialize__()
+
+    metrics_registry.gauge('iostats_cpu_usage', '% in use of every cpu',
+                           lambda: dict(zip(self.cpus, self.cpu_usage)), label='cpu')
+    for metric, name in (('rb/s', 'read_bytes'), ('wb/s', 'written_bytes'), ('iops', 'iops')):
+      metrics_registry.gauge(f'iostats_disk_{name}', f'{metric} of every disk and partition',
+                             lambda metric=metric: dict(zip(self.devices, self.disk_rates.get(metric, []))),
+                             label='device')
   #__init__
 
   def __initialize__(self):
@@ -96,67 +159,110 @@ class IOStats(object):
   #__initialize__
 
   def __initialize_cpus_stats__(self):
-    cpuinfo = '/proc/cpuinfo'
     cpustat = '/proc/stat'
 
-    self.cpus.update({
-      'fd': open(cpustat, 'r'),
-      'cpu': { key: 0 for key in self.__cpu_mapping__.keys() }
-    })
-
-    with open(cpuinfo, 'r') as fr:
-      info = fr.read()
-      for c in info.split('\n'):
-        if c.startswith('processor'):
-          cpuN = f'cpu{c.split(":")[1].strip()}'
-          self.cpus.update({
-            cpuN: { key: 0 for key in self.__cpu_mapping__.keys() },
-          })
-        #endif
-      #endfor
-    #endwith
+    self.__cpustat = open(cpustat, 'rb')
+
+    names, ticks = self.parse_cpustats(self.__read_cpustats__())
+    self.__allocate_cpus__(names)
+    self.__store_cpustats__(ticks, self.cpu_ticks[1])
 
     self.logger.debug(f'CPUS: {self.cpus}')
   #__initialize__cpus_stats__
 
+  def __allocate_cpus__(self, names):
+    """
+      arrays of len(names) cpus, again when a cpu goes online or offline
+    """
+    size = len(names)
+    cols = len(self.__cpu_mapping__)
+
+    self.cpus = [ x.decode() for x in names ]
+    if numpy:
+      self.cpu_ticks = (numpy.zeros((size, cols), dtype=numpy.int64),
+                        numpy.zeros((size, cols), dtype=numpy.int64))
+      self.cpu_usage = numpy.zeros(size, dtype=numpy.float64)
+    else:
+      self.cpu_ticks = ([ [ 0 ] * cols for _ in range(size) ],
+                        [ [ 0 ] * cols for _ in range(size) ])
+      self.cpu_usage = [ 0.0 ] * size
+    #endif
+  #__allocate_cpus__
+
   def __initialize_disks_stats__(self):
-    path = '/sys/block'
-    for disk in os.listdir(path):
-      if disk.startswith('loop'):
+    diskstats = '/proc/diskstats'
+
+    self.__diskstat  = open(diskstats, 'rb')
+    self.__disknames = []  # every name of /proc/diskstats, hot-add is a new list
+    self.__diskrows  = []  # rows of /proc/diskstats that are tracked
+    self.__diskof    = {}  # name -> disk of the device, None if not tracked
+
+    self.__allocate_disks__(*self.parse_diskstats(self.__read_diskstats__()))
+  #__initialize_disks_stats__
+
+  def __allocate_disks__(self, names, stats):
+    """
+      arrays of the disks and partitions in names, again when a device is
+      added or removed. The counters of this read are the previous ones,
+      rates restart from 0
+    """
+    self.__disknames = names
+    self.__diskrows  = []
+    self.devices     = []
+    self.disks       = {}
+
+    for row, name in enumerate(names):
+      name = name.decode()
+      disk = self.__disk_of__(name)
+      if disk is None:
         continue
 
-      self.disks.update({
-        disk: {
-          'path' : f'{path}/{disk}',
-          'fd'   : open(f'{path}/{disk}/stat', 'r'),
-          'stats': { key: 0 for key in self.__disk_mapping__.keys() },
-          'rb/s': 0,
-          'wb/s': 0,
-          'partitions': {}
-        }
-      })
-
-      self.read_disks_abuse.update({
-        disk: []
-      })
-
-      partition_path = self.disks[disk]['path']
-      for partition in os.listdir(partition_path):
-        if not partition.startswith(disk):
-          continue
-
-        self.disks[disk]['partitions'].update({
-          partition: {
-            'fd': open(f'{partition_path}/{partition}/stat', 'r'),
-            'stats': { key: 0 for key in self.__disk_mapping__.keys() },
-            'rb/s': 0,
-            'wb/s': 0
-          }
-        })
+      self.__diskrows.append(row)
+      self.devices.append(name)
+
+      if disk == name:
+        self.disks.setdefault(disk, [])
+      else:
+        self.disks.setdefault(disk, []).append(name)
     #endfor
 
+    self.device_index = { name: i for i, name in enumerate(self.devices) }
+    self.windows      = { k: v for k, v in self.windows.items() if k[0] in self.device_index }
+
+    size = len(self.devices)
+    cols = len(self.__disk_mapping__)
+    if numpy:
+      self.disk_stats = (numpy.zeros((size, cols), dtype=numpy.int64),
+                         numpy.zeros((size, cols), dtype=numpy.int64))
+    else:
+      self.disk_stats = ([ [ 0 ] * cols for _ in range(size) ],
+                         [ [ 0 ] * cols for _ in range(size) ])
+    #endif
+
+    self.__store_diskstats__(stats, self.disk_stats[1])
+    self.disk_times = (None, monotonic())
     self.logger.debug(f'DISKS: {self.disks}')
-  #__initialize_disks_stats__
+  #__allocate_disks__
+
+  def __disk_of__(self, name):
+    """
+      return: name for a disk, the disk of a partition, None for loop devices
+    """
+    if name in self.__diskof:
+      return self.__diskof[name]
+
+    disk   = None
+    sysfs  = f'/sys/class/block/{name}'
+    if name.startswith('loop'):
+      disk = None
+    elif os.path.exists(f'/sys/block/{name}'):
+      disk = name
+    elif os.path.exists(f'{sysfs}/partition'):
+      disk = os.path.basename(os.path.dirname(os.path.realpath(sysfs)))
+
+    self.__diskof[name] = disk
+    return disk
+  #__disk_of__
 
   def loop(self, flags=0):
     #flags => unit for show data (not implement)
@@ -164,158 +270,305 @@ class IOStats(object):
       if self.terminate:
         break
 
+      profiler.checkpoint()
       self.cpustats()
-      cpu_usage = []
+      cpu_usage = [ f'{x}' for x in self.cpu_usage ]
+      usage     = max(self.cpu_usage[1:], default=0) # without 'cpu', all cpus
       log_level = -1
-      for cpu in self.cpus.keys():
-        if cpu in ['fd']:
-          continue
-
-        usage = self.cpus[cpu]['usage']
 
-        if cpu not in ['cpu']:
-          if usage > 35 and usage <= 85:
-            log_level = -2
-          elif usage > 85:
-            log_level = -3
-
-        cpu_usage.append(f'{usage}')
-      #endfor
+      if usage > 35 and usage <= 85:
+        log_level = -2
+      elif usage > 85:
+        log_level = -3
 
       if log_level != -1:
         self.logger.log((log_level, f'usage {cpu_usage}'))
 
+      if self.crypto is not None:
+        for alert in self.crypto.check(busy=log_level != -1):
+          self.logger.log(alert)
+
       self.diskstats()
-      log_level = -1
-      for disk in self.disks.keys():
-        self.read_disks_abuse[disk].append(self.disks[disk]['rb/s'])
+      alerts = []
+      hot    = False
+      for device, row in self.device_index.items():
+        for metric, rates in self.disk_rates.items():
+          window = self.__window__(device, metric)
+          if window is None:
+            continue
 
-        if len(self.read_disks_abuse[disk]) >= self.read_disks_abuse_max_counter:
-          abuse = sum(self.read_disks_abuse[disk]) / self.read_disks_abuse_max_counter
+          value = float(rates[row])
+          hot   = hot or bool(window.warning and value > window.warning)
 
-          if abuse > self.read_disks_abuse_warning and abuse <= self.read_disks_abuse_critical:
-            log_level = -2
-          elif abuse > self.read_disks_abuse_critical:
-            log_level = -3
+          if window.update(value) is None:
+            continue
 
+          log_level = window.level()
           if log_level != -1:
-            self.logger.log((log_level, f'reading abuse in {disk}, {abuse / 1024} kB/s'))
-
-          self.read_disks_abuse[disk].pop(0)
-        #endif
+            alerts.append((log_level, device, metric, window))
+        #endfor
       #endfor
 
+      self.__sample_processes__(hot)
+
+      for log_level, device, metric, window in alerts:
+        self.logger.log((log_level, self.__abuse_message__(device, metric, window)))
+
       sleep(self.interval)
     #endwhile
   #loop
 
-  def cpustats(self):
-    fd = self.cpus['fd']
-    for cpu in self.cpus.keys():
-      if cpu in ['fd', 'usage']:
-        continue
+  def set_limit(self, device, metric, window=None, warning=None, critical=None):
+    """
+      param: device  disk or partition name, None for the default of the disks
+      param: metric  'rb/s', 'wb/s' or 'iops'
+      param: window, warning, critical  None keeps the current value
+    """
+    if metric not in self.limits:
+      raise ValueError(f'metric {metric} not valid')
+
+    current = self.device_limits.get(device, {}).get(metric, self.limits[metric])
+    limit   = tuple(x if x is not None else y for x, y in zip((window, warning, critical), current))
+    if limit[0] < 1:
+      raise ValueError(f'window {limit[0]} of {metric} not valid')
+
+    if device is None:
+      self.limits[metric] = limit
+      self.windows = { k: v for k, v in self.windows.items() if k[1] != metric }
+    else:
+      self.device_limits.setdefault(device, {})[metric] = limit
+      self.windows.pop((device, metric), None)
+    #endif
+  #set_limit
+
+  def __window__(self, device, metric):
+    """
+      return: IOWindow of device and metric, None if it is not checked
+    """
+    window = self.windows.get((device, metric))
+    if window is not None:
+      return window
 
-      previous = self.cpus[cpu].copy()
-      current  = self.__read_cpustats__(fd, cpu)
+    limit = self.device_limits.get(device, {}).get(metric)
+    if limit is None and device in self.disks:
+      limit = self.limits[metric]
 
-      current['usage'] = self.get_cpustatistics((previous, current))
+    if limit is None:
+      return None
 
-      self.cpus.update({
-        cpu: current
-      })
-    #endfor
+    window = self.windows[(device, metric)] = IOWindow(*limit)
+    return window
+  #__window__
+
+  def __abuse_message__(self, device, metric, window):
+    name, unit, suffix = self.__abuse_messages__[metric]
+    average = round(window.average / unit, 2)
+    peak    = round(window.peak / unit, 2)
+
+    message = f'{name} in {device}, {average} {suffix}, peak {peak} {suffix} in {window.size * self.interval} s'
+
+    if self.procio is not None and self.procio.last is not None:
+      key = 'read' if metric == 'rb/s' else 'write' if metric == 'wb/s' else 'total'
+      rate = self.procio.__keys__[key]
+      top  = [ f'{x.comm}[{x.pid}] {round(rate(x) / 1024, 2)} kB/s' for x in self.procio.top(key) ]
+      message += f', top {", ".join(top) if top else "none"}'
+    #endif
+
+    return message
+  #__abuse_message__
+
+  def __sample_processes__(self, hot):
+    """
+      param: hot  a device is above its warning in this interval
+    """
+    if self.procio is None:
+      return
+
+    self.__top_tick += 1
+    if hot or (self.top_every and self.__top_tick >= self.top_every):
+      self.procio.sample()
+      self.__top_tick = 0
+    #endif
+  #__sample_processes__
+
+  def cpustats(self):
+    """
+      /proc/stat is read once and every cpu parsed in the same pass, the
+      usage of all cpus is computed at once from the delta of ticks
+    """
+    names, ticks = self.parse_cpustats(self.__read_cpustats__())
+    if len(names) != len(self.cpus):
+      self.__allocate_cpus__(names)   # cpu hotplug, usage restarts
+      self.__store_cpustats__(ticks, self.cpu_ticks[1])
+
+    previous, current = self.cpu_ticks[1], self.cpu_ticks[0]
+    self.__store_cpustats__(ticks, current)
+
+    self.cpu_ticks = (previous, current)
+    self.cpu_usage = self.get_cpustatistics(self.cpu_ticks)
   #cpustats
 
   def diskstats(self):
-    for disk in self.disks.keys():
-      fd = self.disks[disk]['fd']
-      previous = self.disks[disk]['stats'].copy()
-      current  = self.__read_diskstat__(fd)
-      bps      = self.get_diskstatistics((previous, current))
-
-      self.disks[disk]['stats'] = current
-      self.disks[disk]['rb/s']  = bps['rb/s']
-      self.disks[disk]['wb/s']  = bps['wb/s']
-
-      for partition in self.disks[disk]['partitions'].keys():
-        fd = self.disks[disk]['partitions'][partition]['fd']
-        previous = self.disks[disk]['partitions'][partition]['stats'].copy()
-        current  = self.__read_diskstat__(fd)
-        bps      = self.get_diskstatistics((previous, current))
-
-        self.disks[disk]['partitions'][partition]['stats'] = current
-        self.disks[disk]['partitions'][partition]['rb/s']  = bps['rb/s']
-        self.disks[disk]['partitions'][partition]['wb/s']  = bps['wb/s']
-      #endfor
-    #endfor
+    """
+      /proc/diskstats is read once for every disk and partition, a device
+      added after the start is tracked from the first read it appears
+    """
+    names, stats = self.parse_diskstats(self.__read_diskstats__())
+    now = monotonic()
+    if names != self.__disknames:
+      self.__diskof = {}   # a name can be reused by another device
+      self.__allocate_disks__(names, stats)
+    #endif
+
+    previous, current = self.disk_stats[1], self.disk_stats[0]
+    self.__store_diskstats__(stats, current)
+
+    self.disk_stats = (previous, current)
+    self.disk_times = (self.disk_times[1], now)
+    self.disk_rates = self.get_diskstatistics(self.disk_stats, now - self.disk_times[0])
   #diskstats
 
   def get_cpustatistics(self, v):
+    """
+      param: v  tuple(previous, current) ticks, one row per cpu
+
+      return: % in use of every cpu, rounded to 2 decimals
+    """
     previous, current = v
+    idle = self.__CPU_IDLE - 1
 
-    cpu_previous_sum = sum([y for x, y in previous.items() if x not in ['usage']])
-    cpu_current_sum  = sum([y for x, y in current.items() if x not in ['usage']])
+    if numpy:
+      delta = current - previous
+      total = delta.sum(axis=1)
+      inuse = total - delta[:, idle]
 
-    cpu_delta = cpu_current_sum - cpu_previous_sum
-    cpu_idle  = current['idle'] - previous['idle']
-    cpu_inuse = cpu_delta - cpu_idle
+      return numpy.round(100 * inuse / numpy.maximum(total, 1), 2)
+    #endif
 
-    return round(100 * cpu_inuse / cpu_delta, 2)
+    usage = []
+    for p, c in zip(previous, current):
+      total = sum(c) - sum(p)
+      inuse = total - (c[idle] - p[idle])
+      usage.append(round(100 * inuse / max(total, 1), 2))
+    #endfor
+
+    return usage
   #get_cpustatistics
 
-  def get_diskstatistics(self, v, stats=['sectors_read', 'sectors_written']):
-    #v => tuple(Dict(previous), Dict(current))
+  def get_diskstatistics(self, v, elapsed=None):
+    """
+      param: v        tuple(previous, current) counters, one row per device
+      param: elapsed  seconds between the two reads, by default interval.
+                      The loop sleeps interval after its work, the time
+                      between two reads is longer
+
+      return: dict { 'rb/s': [...], 'wb/s': [...], 'iops': [...] } bytes
+              and io requests per second of every device
+    """
     previous, current = v
+    elapsed = max(elapsed or self.interval, 1e-3)
 
     out = {}
-    for stat in stats:
-      if previous[stat] == 0:
-        previous[stat] = current[stat]
-
-      key = self.__disks_stats_mapping__[stat]
-
-      out[key] = self.__value__((previous[stat], current[stat]))
+    for stat, key in self.__disks_stats_mapping__.items():
+      pos = self.__disk_mapping__[stat]
+      if numpy:
+        out[key] = (current[:, pos] - previous[:, pos]) * self.sector_size / elapsed
+      else:
+        out[key] = [ (c[pos] - p[pos]) * self.sector_size / elapsed
+                     for p, c in zip(previous, current) ]
     #endfor
 
+    reads  = self.__disk_mapping__['reads_completed']
+    writes = self.__disk_mapping__['writes_completed']
+    if numpy:
+      out['iops'] = (current[:, reads] - previous[:, reads] +
+                     current[:, writes] - previous[:, writes]) / elapsed
+    else:
+      out['iops'] = [ (c[reads] - p[reads] + c[writes] - p[writes]) / elapsed
+                      for p, c in zip(previous, current) ]
+
     return out
   #get_diskstatistics
 
-  def __read_cpustats__(self, fd, cpu):
-    fd.seek(0)
-    read_line_stats = fd.read().split('\n')
-    read_stats = []
-    while len(read_line_stats) > 0:
-      line = read_line_stats.pop(0)
-      if line.startswith(cpu):
-        read_stats = line.strip().split()
-        read_line_stats = []
-    #endwhile
+  def __read_cpustats__(self):
+    self.__cpustat.seek(0)
+    return self.__cpustat.read()
+  #__read_cpustats__
 
-    stats = {}
-    for key, pos in self.__cpu_mapping__.items():
-      stats[key] = int(read_stats[pos])
+  @classmethod
+  def parse_cpustats(cls, data):
+    """
+      param: data  content of /proc/stat (bytes)
 
-    return stats
-  #__read_cpustats__
+      return: tuple(names, ticks), ticks is the flat list of columns 1..9
+              of every 'cpu' line as bytes
+    """
+    # the cpu lines are the first ones, the rest (intr, softirq) is not split
+    end = 0
+    while data.startswith(b'cpu', end):
+      end = data.find(b'\n', end) + 1 or len(data)
+
+    lines = data[:end].split(b'\n')
+    cols  = len(cls.__cpu_mapping__)
+    names = []
+    ticks = []
+    for line in lines:
+      fields = line.split()
+      if not fields:
+        continue
+
+      names.append(fields[0])
+      ticks += fields[1: cols + 1]
+    #endfor
 
-  def __read_diskstat__(self, fd):
-    fd.seek(0)
-    read_stats = fd.read(1024).strip().split()
+    return names, ticks
+  #parse_cpustats
 
-    stats = {}
-    for key, pos in self.__disk_mapping__.items():
-      stats[key] = float(read_stats[pos])
+  def __store_cpustats__(self, ticks, out):
+    cols = len(self.__cpu_mapping__)
+    if numpy:
+      out[:] = numpy.array(ticks).reshape(-1, cols)
+      return
 
-    return stats
-  #__read_diskstat__
+    for i, row in enumerate(out):
+      row[:] = map(int, ticks[i * cols: (i + 1) * cols])
+  #__store_cpustats__
 
-  def __value__(self, v):
+  def __read_diskstats__(self):
+    self.__diskstat.seek(0)
+    return self.__diskstat.read()
+  #__read_diskstats__
+
+  @classmethod
+  def parse_diskstats(cls, data):
     """
-      param: v  tuple(previous, current)
+      param: data  content of /proc/diskstats (bytes)
 
-      return: int value in bytes
+      return: tuple(names, stats), stats is the flat list of the first
+              columns after the name of every line as bytes
     """
-    iop, ioc = v
-    return ((ioc * self.sector_size) - (iop * self.sector_size)) / self.interval
-  #__value__
+    cols  = len(cls.__disk_mapping__)
+    names = []
+    stats = []
+    for line in data.split(b'\n'):
+      fields = line.split()
+      if len(fields) < cols + 3:
+        continue
+
+      names.append(fields[2])
+      stats += fields[3: cols + 3]
+    #endfor
+
+    return names, stats
+  #parse_diskstats
+
+  def __store_diskstats__(self, stats, out):
+    cols = len(self.__disk_mapping__)
+    if numpy:
+      out[:] = numpy.array(stats).reshape(-1, cols)[self.__diskrows]
+      return
+
+    for i, row in enumerate(self.__diskrows):
+      out[i][:] = map(int, stats[row * cols: (row + 1) * cols])
+  #__store_diskstats__
 #class IOStats
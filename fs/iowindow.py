@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+# ./fs/iowindow.py
+#
+# Sliding window of a per second rate (rb/s, wb/s, iops) with warning and
+# critical thresholds
+#
+from collections import deque
+
+
+class IOWindow(object):
+  """
+    Ring buffer of the last `size` samples with a running sum, the average
+    is O(1) per update. The peak of the window is kept in a monotonic deque
+    (amortized O(1)) and the highest sample since the start in `maximum`.
+  """
+  __slots__ = ('size', 'warning', 'critical', 'samples', 'pos', 'number',
+               'total', 'peaks', 'maximum')
+
+  def __init__(self, size=10, warning=0, critical=0):
+    """
+      param: size      samples in the window, one per IOStats interval
+      param: warning   average above it is a warning, 0 disables it
+      param: critical  average above it is critical, 0 disables it
+    """
+    if size < 1:
+      raise ValueError(f'window size {size} not valid')
+
+    self.size     = size
+    self.warning  = warning
+    self.critical = critical
+
+    self.samples = [ 0.0 ] * size
+    self.pos     = 0        # next slot of samples
+    self.number  = 0        # samples added since the start
+    self.total   = 0.0      # sum of samples
+    self.peaks   = deque()  # (sample number, value), values decreasing
+    self.maximum = 0.0
+  #__init__
+
+  def update(self, value):
+    """
+      param: value  last sample
+
+      return: average of the window, None until the window is full
+    """
+    self.total += value - self.samples[self.pos]
+    self.samples[self.pos] = value
+    self.pos     = (self.pos + 1) % self.size
+    self.number += 1
+
+    # every lap of the ring the sum is computed again, the float error of
+    # the running sum does not accumulate
+    if self.pos == 0:
+      self.total = sum(self.samples)
+
+    while self.peaks and self.peaks[-1][1] <= value:
+      self.peaks.pop()
+
+    self.peaks.append((self.number, value))
+    if self.peaks[0][0] <= self.number - self.size:
+      self.peaks.popleft()
+
+    self.maximum = max(self.maximum, value)
+
+    return self.average if self.count == self.size else None
+  #update
+
+  @property
+  def count(self):
+    return min(self.number, self.size)
+
+  @property
+  def average(self):
+    return self.total / self.count if self.count else 0.0
+
+  @property
+  def peak(self):
+    """
+      highest sample in the window
+    """
+    return self.peaks[0][1] if self.peaks else 0.0
+
+  def level(self, value=None):
+    """
+      param: value  average to check, by default the one of the window
+
+      return: log level, -1 ok, -2 warning, -3 critical
+    """
+    if self.count < self.size:
+      return -1
+
+    value = self.average if value is None else value
+    if self.critical and value > self.critical:
+      return -3
+
+    if self.warning and value > self.warning:
+      return -2
+
+    return -1
+  #level
+
+  def __repr__(self):
+    return repr({ 'size': self.size, 'average': self.average, 'peak': self.peak,
+                  'maximum': self.maximum })
+#class IOWindow
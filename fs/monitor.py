@@ -7,28 +7,65 @@
 # Object to monitoring filesystem
 #
 import os
+import selectors
 
 from threading import Lock
 from time      import time
-from ctypes    import c_int, get_errno
-from fcntl     import ioctl
-from termios   import FIONREAD
+from ctypes    import get_errno
 from io        import FileIO
 
 from fs    import *
-from utils import ToObject, Logger, shannon_entropy
+from utils import Logger, explore, metrics_registry, memory_governor, profiler
+
+# stages of the reader timed by the profiler, see fs/fanotify.py too
+stage_parse   = profiler.stage('parse')
+stage_handler = profiler.stage('handler')
 
 
 class FSWatcher(FileIO):
 
-  def __init__(self, extensions=[]):
-    FileIO.__init__(self, inotify_init(os.O_NONBLOCK))
+  read_size = 64 * 1024  # bytes per read(), the queue is drained until EAGAIN
+
+  def __init__(self, extensions=[], workers=0, queue_size=1024,
+                     quiet=0.25, maxdelay=2.0, verify_on_close=False, close_timeout=30,
+                     fd=None):
+    # fd of another backend (fanotify), inotify by default
+    FileIO.__init__(self, fd if fd is not None else inotify_init(os.O_NONBLOCK))
+
+    # loop() blocks in epoll on the event fd and on a pipe used to wake it
+    # up when terminate is set
+    self.__wakeup   = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+    self.__selector = selectors.DefaultSelector()
+    self.__selector.register(self.fileno(), selectors.EVENT_READ)
+    self.__selector.register(self.__wakeup[0], selectors.EVENT_READ)
+
+    self.overflows = 0
+
+    self.__buffer = bytearray(self.read_size)
+    self.__view   = memoryview(self.__buffer)
 
     self.__lock = Lock()
-    self.__to_watcher = {}
+    self.__to_watcher = FSWatchRegistry()
     self.__extensions = extensions
-
-    self.__integrity = FSIntegrity()
+    self.__suffixes   = set(x.encode() for x in extensions) if isinstance(extensions, list) else set()
+
+    # with workers the reader only decodes events, files are verified by
+    # FSVerifier threads with their own FSIntegrity (sqlite connection)
+    self.__verifier  = FSVerifier(workers, queue_size) if workers > 0 else None
+    self.__integrity = FSIntegrity() if workers <= 0 else None
+    self.__scan      = bytearray(FSIntegrity.buffer) if workers <= 0 else None  # scan of the files verified here
+
+    # events of a file are merged until it is quiet for `quiet` seconds,
+    # at most `maxdelay` seconds after the first one. With verify_on_close a
+    # modified file is verified once on IN_CLOSE_WRITE, or close_timeout
+    # seconds after the first write if it is still open
+    self.__coalescer = None
+    if quiet > 0 or verify_on_close:
+      self.__coalescer = FSCoalescer(quiet, maxdelay,
+                                     hold_mask=IN_MODIFY if verify_on_close else 0,
+                                     release_mask=IN_CLOSE_WRITE if verify_on_close else 0,
+                                     hold=close_timeout)
+    #endif
 
     if not isinstance(self.__extensions, list):
       raise FSWatcherError(-2, 'type of extensions not valid')
@@ -36,24 +73,122 @@ class FSWatcher(FileIO):
     self.terminate = False
     self.logger = Logger()
     self.logger.debug(f'__to_watcher -> {self.__to_watcher}')
+
+    # counters are per thread, the gauges are read when a snapshot is taken
+    self.events_counter    = metrics_registry.counter('fswatcher_events', 'events read')
+    self.overflows_counter = metrics_registry.counter('fswatcher_overflows', 'queue overflows')
+    metrics_registry.gauge('fswatcher_watches', 'directories watched',
+                           lambda: len(self.__to_watcher))
+    metrics_registry.gauge('fswatcher_coalescer_pending', 'files waiting in the coalescer',
+                           lambda: len(self.__coalescer) if self.__coalescer is not None else 0)
+    metrics_registry.gauge('fswatcher_coalescer_merged', 'events merged by the coalescer',
+                           lambda: self.__coalescer.merged if self.__coalescer is not None else 0)
+    metrics_registry.gauge('verifier_queue_depth', 'files queued to the verifiers',
+                           lambda: self.__verifier.depth if self.__verifier else 0)
+    metrics_registry.gauge('verifier_backpressure', 'submits that waited for a full queue',
+                           lambda: self.__verifier.backpressure if self.__verifier else 0)
+
+    # estimated bytes per watch, pending file and queued file. Over budget the
+    # pending events of the coalescer are sent to the verifiers at once
+    self.__spill = False
+    memory_governor.register('watches', lambda: len(self.__to_watcher) * 400, 0.25)
+    memory_governor.register('coalescer',
+                             lambda: len(self.__coalescer) * 600 if self.__coalescer is not None else 0,
+                             0.1, self.spill)
+    memory_governor.register('verifier',
+                             lambda: self.__verifier.depth * 400 if self.__verifier else 0, 0.1)
   #__init__
 
   def __del__(self):
     self._del_watchers()
+
+    for fd in self.__wakeup:
+      os.close(fd)
   #__del__
 
   def loop(self):
-    while True:
-      if self.terminate:
-        break
+    if self.__verifier:
+      self.__verifier.start()
 
-      for event in self.read_events():
-        self.logger.log(event)
+    while not self.terminate:
+      profiler.checkpoint()
+      timeout = self.__coalescer.timeout() if self.__coalescer is not None else None
+
+      for key, _ in self.__selector.select(timeout):
+        if key.fd == self.__wakeup[0]:
+          self.__drain_wakeup()
+          continue
+
+        for event in self.read_events():
+          self.logger.log(event)
+      #endfor
 
-      sleep(0.2)
+      spill, self.__spill = (self.__spill, False)
+      for event in self.dispatch(flush=spill):
+        self.logger.log(event)
     #endwhile
+
+    for event in self.dispatch(flush=True):
+      self.logger.log(event)
+
+    if self.__verifier:
+      self.__verifier.stop()
   #loop
 
+  def dispatch(self, flush=False):
+    """
+      verify the coalesced events whose window expired, all of them with
+      flush. Yield the results verified in this thread.
+    """
+    if self.__coalescer is None:
+      return
+
+    items = self.__coalescer.flush() if flush else self.__coalescer.due()
+    for item in items:
+      if self.__verifier:
+        self.__verifier.submit(*item)
+        continue
+
+      yield verify_event(self.__integrity, *item, buffer=self.__scan)
+    #endfor
+  #dispatch
+
+  def spill(self):
+    """
+      ask loop() to send every pending event of the coalescer to the
+      verifiers, called by the memory governor
+    """
+    self.__spill = True
+    os.write(self.__wakeup[1], b'\0')
+  #spill
+
+  @property
+  def coalescer(self):
+    return self.__coalescer
+
+  @property
+  def verifier(self):
+    return self.__verifier
+
+  def __drain_wakeup(self):
+    try:
+      while os.read(self.__wakeup[0], 512):
+        pass
+    except BlockingIOError:
+      pass
+  #__drain_wakeup
+
+  @property
+  def terminate(self):
+    return self.__terminate
+
+  @terminate.setter
+  def terminate(self, v):
+    self.__terminate = v
+
+    if v:
+      os.write(self.__wakeup[1], b'\0')
+
   def add_event(self, path, flags=IN_ALL_EVENTS, wd_parent=0, iflags=0):
     iflags |= flags | IN_ALL_EVENTS | IN_ONLYDIR
     path = path if isinstance(path, bytes) else path.encode()
@@ -66,12 +201,7 @@ class FSWatcher(FileIO):
       raise FSWatcherError(errno, strerror(errno))
 
     with self.__lock:
-      self.__to_watcher[wd] = ToObject(**{
-        'wd': wd,
-        'path': path,
-        'wd_parent': wd_parent,
-        'flags': flags
-      })
+      return self.__to_watcher.add(wd, path, flags, wd_parent)
   #add_event
 
   def __handler(self, entry, mask, event, wd):
@@ -81,111 +211,138 @@ class FSWatcher(FileIO):
       exists = self._watcher_exists(entry)
 
       if os.path.isdir(entry) and not exists:
-        self.add_event(entry, event.flags, wd)
+        watch = self.add_event(entry, event.flags, wd)
+
+        # a directory moved in brings its subdirectories, and mkdir -p can
+        # create them before the watch of the parent exists
+        for path in explore(entry, directory=True):
+          if self._watcher_exists(path):
+            continue
+
+          parent = self.__to_watcher.find(os.path.dirname(path).encode())
+          self.add_event(path, event.flags, parent.wd if parent else watch.wd)
+        #endfor
+      #endif
 
-      if exists and mask & IN_DELETE:
+      if exists and (mask & IN_DELETE or mask & IN_MOVED_FROM):
         with self.__lock:
           self._del_watcher_by_path(entry)
     #endif
 
     flag = mask & event.flags
-    if flag:
-      entropy = shannon_entropy(entry.encode())
-      fsevent = FSEvent(event, flag, entry)
-      self.result = (-1, f'{fsevent.events_name} to `{entry}`, entropy {entropy}')
-
-      if mask & IN_MODIFY or mask & IN_MOVED_TO or mask & IN_MOVED_FROM:
-        if not self.__integrity.validate(entry.encode()):
-          info = self.__integrity.get(entry.encode())
-          hash = self.__integrity.hash(entry.encode())
+    if flag and not mask & IN_ISDIR:
+      self.result = self._submit((wd, entry), entry, mask, flag, event)
+  #__handler
 
-          self.result = (-2, f'{fsevent.events_name} `{entry}`, entropy {entropy}')
+  def _submit(self, key, entry, mask, flag, event):
+    """
+      coalesce, queue to the verifier or verify the file in this thread
 
-          if info and info['hash'] != hash:
-            self.result = (-3, f'{fsevent.events_name} `{entry}` has been modified, entropy {entropy}')
-        #endif
-      #endif
-
-      if mask & IN_DELETE:
-        self.result = ((-3 , f'{fsevent.events_name} to `{entry}`, entropy {entropy}'))
-  #__handler
+      return: result of verify_event when verified here, None otherwise
+    """
+    if self.__coalescer is not None:
+      self.__coalescer.add(key, entry, mask, flag, event)
+    elif self.__verifier:
+      self.__verifier.submit(entry, mask, flag, event)
+    else:
+      return verify_event(self.__integrity, entry, mask, flag, event, buffer=self.__scan)
+  #_submit
 
   def read_events(self, timeout=1):
     try:
-      entry, data, avail = (None, b'', c_int())
-      ioctl(self, FIONREAD, avail)
-      if not avail.value:
+      for size in self.__read():
+        yield from self._events(self.__view, size)
+
+    except OSError as e:
+      raise FSWatcherError(*e.args)
+  #read_event
+
+  def __read(self):
+    while not self.terminate:
+      size = self.readinto(self.__buffer)  # None on EAGAIN
+      if not size:
         return
 
-      data = os.read(self.fileno(), avail.value)
-      for wd, mask, cookie, name in FSEvent.parse(data):
-        with self.__lock:
-          event = self.__to_watcher.get(wd)
+      yield size
+    #endwhile
+  #__read
+
+  def _events(self, view, size):
+    for wd, mask, cookie, offset, length in FSEvent.decode(view, size):
+      start = profiler.start()
+      self.events_counter.inc()
+
+      if mask & IN_Q_OVERFLOW:
+        self.overflows += 1
+        self.overflows_counter.inc()
+        yield (-2, f'inotify queue overflow, events lost ({self.overflows})')
+        continue
+      #endif
 
-        if   not event or \
-             mask & IN_DONT_FOLLOW or \
-             mask & IN_EXCL_UNLINK:
-          continue #exclude sym links
+      with self.__lock:
+        event = self.__to_watcher.get(wd)
 
-        if mask & IN_ISDIR != IN_ISDIR and len(self.__extensions) > 0:
-          ext = name.decode().split('.')[-1]
-          if ext not in self.__extensions:
-            continue
-        #endif
+      if   not event or \
+           mask & IN_DONT_FOLLOW or \
+           mask & IN_EXCL_UNLINK:
+        continue #exclude sym links
 
-        entry  = f'{os.path.join(event.path, name).decode().rstrip("/")}'
-        self.logger.debug(f'read_events: wd {wd}, cookie {cookie}, entry {entry}, mask {hex(mask)}')
+      name = FSEvent.filename(view, offset, length)
 
-        self.__handler(entry, mask, event, wd)
+      if name and mask & IN_ISDIR != IN_ISDIR and not self._check_extension_file(name):
+        continue
 
-        if mask & IN_ISDIR:
-          continue
+      entry  = f'{os.path.join(event.path, name).decode().rstrip("/")}'
+      self.logger.debug(f'read_events: wd {wd}, cookie {cookie}, entry {entry}, mask {hex(mask)}')
+      profiler.stop(stage_parse, start)
 
-        if mask & IN_IGNORED:
-          with self.__lock:
-            try:               del self.__to_watcher[wd]
-            except KeyError:   pass
-        #endif
+      start = profiler.start()
+      self.__handler(entry, mask, event, wd)
+      profiler.stop(stage_handler, start)
 
-        if self.result:
-          yield self.result
-        #endif
-      #endfor
+      if mask & IN_ISDIR:
+        continue
 
-    except OSError as e:
-      raise FSWatcherError(*e.args)
-  #read_event
+      if mask & IN_IGNORED:
+        with self.__lock:
+          self.__to_watcher.remove(wd)
+      #endif
+
+      if self.result:
+        yield self.result
+      #endif
+    #endfor
+  #_events
 
   def _check_extension_file(self, filepath):
-    pass
-  #_exclude_file
+    """
+      True if filepath (bytes) has one of the extensions to monitor
+    """
+    if len(self.__suffixes) == 0:
+      return True
+
+    return filepath.rsplit(b'.', 1)[-1] in self.__suffixes
+  #_check_extension_file
 
   def _watcher_exists(self, path):
     path = path if isinstance(path, bytes) else path.encode()
 
-    for wd in self.__to_watcher.keys():
-      watcher = self.__to_watcher.get(wd)
-      if watcher.path == path:
-        return True
-    #endfor
-
-    return False
+    return path in self.__to_watcher
   #_watcher_exists
 
   def _del_watcher_by_path(self, path):
+    """
+      remove the watch of path and the watches of every subdirectory
+    """
     path = path if isinstance(path, bytes) else path.encode()
-    wds = list(self.__to_watcher.keys())
-    for wd in wds:
-      watcher = self.__to_watcher.get(wd)
-      if watcher.path == path:
-        del self.__to_watcher[wd]
-        inotify_rm_watch(self.fileno(), wd)
+    for watcher in self.__to_watcher.remove_subtree(path):
+      inotify_rm_watch(self.fileno(), watcher.wd)
   #_del_watcher_by_path
 
   def _del_watchers(self):
     with self.__lock:
-      for wd in self.__to_watcher.keys():
-        inotify_rm_watch(self.fileno(), wd)
+      for watcher in self.__to_watcher:
+        inotify_rm_watch(self.fileno(), watcher.wd)
   #rm_watcher
 #class FSWatcher
 
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+#
+# ./fs/procstats.py
+#
+# Per process statistics from /proc/<pid>, used to name the processes
+# behind an alert of IOStats
+#
+import os
+
+from heapq     import nlargest
+from operator  import attrgetter
+from time      import monotonic
+
+
+class ProcEntry(object):
+  """
+    Counters of one pid between two samples
+  """
+  __slots__ = ('pid', 'fd', 'comm', 'read', 'write', 'time', 'rrate', 'wrate')
+
+  def __init__(self, pid, time=None):
+    self.pid   = pid
+    self.fd    = None   # /proc/<pid>/io kept open while there are fds left
+    self.comm  = None   # read the first time it is shown
+    self.read  = None   # read_bytes
+    self.write = None   # write_bytes
+    self.time  = time   # monotonic time of read and write
+    self.rrate = 0.0    # bytes per second read in the last sample
+    self.wrate = 0.0    # bytes per second written in the last sample
+  #__init__
+
+  @property
+  def rate(self):
+    return self.rrate + self.wrate
+
+  def __repr__(self):
+    return repr({ 'pid': self.pid, 'comm': self.comm,
+                  'rb/s': self.rrate, 'wb/s': self.wrate })
+#class ProcEntry
+
+
+class ProcCPUEntry(object):
+  """
+    utime + stime of one pid between two samples
+  """
+  __slots__ = ('pid', 'fd', 'comm', 'ticks', 'time', 'cpu', 'load', 'threads', 'streak')
+
+  def __init__(self, pid, time=None):
+    self.pid     = pid
+    self.fd      = None
+    self.comm    = None   # from /proc/<pid>/stat, no read of comm
+    self.ticks   = None   # utime + stime
+    self.time    = time   # monotonic time of ticks
+    self.cpu     = 0.0    # % of one cpu in the last sample, whole process
+    self.load    = 0.0    # cpu per thread that can run, threads capped to the cpus
+    self.threads = 1
+    self.streak  = 0      # consecutive samples with load above saturation
+  #__init__
+
+  def __repr__(self):
+    return repr({ 'pid': self.pid, 'comm': self.comm, 'cpu': self.cpu, 'load': self.load,
+                  'threads': self.threads, 'streak': self.streak })
+#class ProcCPUEntry
+
+
+class ProcFiles(object):
+  """
+    Entries of the pids kept between samples with their /proc/<pid>/<filename>
+    open (up to max_fds), /proc/<pid>/comm is only read when it is shown
+  """
+
+  max_fds  = 512    # files kept open, the rest is opened on every read
+  filename = None   # file of /proc/<pid> read by the sampler
+
+  def __init__(self, top=5, proc='/proc'):
+    """
+      param: top   processes returned by top()
+      param: proc  mount point of procfs
+    """
+    self.top_k = top
+    self.proc  = proc
+    self.pids  = {}    # pid -> entry
+    self.last  = None  # monotonic time of the last sample
+    self.fds   = 0
+  #__init__
+
+  def __del__(self):
+    for entry in self.pids.values():
+      if entry.fd is not None:
+        os.close(entry.fd)
+  #__del__
+
+  def __read__(self, entry, size=512):
+    """
+      return: content of /proc/<pid>/<filename>, None if it cannot be read
+    """
+    fd = entry.fd
+    if fd is None:
+      try:
+        fd = os.open(f'{self.proc}/{entry.pid}/{self.filename}', os.O_RDONLY | os.O_CLOEXEC)
+      except OSError:
+        return None
+
+      if self.fds < self.max_fds:
+        entry.fd  = fd
+        self.fds += 1
+    #endif
+
+    try:
+      return os.pread(fd, size, 0)
+    except OSError:
+      return None # ESRCH, the process of the fd has exited
+    finally:
+      if entry.fd is None:
+        os.close(fd)
+  #__read__
+
+  def __comm__(self, pid):
+    try:
+      with open(f'{self.proc}/{pid}/comm', 'rb') as fr:
+        return fr.read().strip().decode(errors='replace')
+    except OSError:
+      return '?'
+  #__comm__
+
+  def __drop__(self, pid):
+    entry = self.pids.pop(pid)
+    if entry.fd is not None:
+      os.close(entry.fd)
+      self.fds -= 1
+  #__drop__
+#class ProcFiles
+
+
+class ProcIO(ProcFiles):
+  """
+    read_bytes and write_bytes of every process from /proc/<pid>/io. A
+    sample reads at most max_pids, a pass over every pid of /proc can take
+    several samples and the rate of a pid is the delta since its own
+    previous read.
+  """
+
+  filename = 'io'
+  max_pids = 2048   # pids read by one sample, 0 reads all of them
+
+  __keys__ = {
+    'read': attrgetter('rrate'),
+    'write': attrgetter('wrate'),
+    'total': attrgetter('rate')
+  }
+
+  def __init__(self, top=5, proc='/proc'):
+    ProcFiles.__init__(self, top, proc)
+
+    self.__pending = []      # pids of the pass not read yet
+    self.__seen    = set()   # pids of the pass read
+    self.__pass    = None    # monotonic time the pass started
+  #__init__
+
+  def sample(self):
+    """
+      read the counters of the next max_pids pids of the pass, a new pass
+      lists /proc again. The pids gone are dropped at the end of a pass
+    """
+    now = monotonic()
+    if not self.__pending:
+      self.__pending = [ int(x) for x in os.listdir(self.proc) if x.isdigit() ]
+      self.__pending.reverse()   # popped from the end
+      self.__seen    = set()
+    #endif
+
+    count = min(self.max_pids or len(self.__pending), len(self.__pending))
+    for _ in range(count):
+      pid   = self.__pending.pop()
+      entry = self.pids.get(pid)
+      if entry is None:
+        # a pid not seen in the previous pass started after it, all its io
+        # was done since then
+        entry = self.pids[pid] = ProcEntry(pid, self.__pass)
+
+      counters = self.__counters__(entry)
+      if counters is None:
+        continue # exited or not allowed
+
+      read, write = counters
+      elapsed = now - entry.time if entry.time is not None else 0
+      if elapsed > 0:
+        entry.rrate = (read - (entry.read or 0)) / elapsed
+        entry.wrate = (write - (entry.write or 0)) / elapsed
+      #endif
+
+      entry.read, entry.write, entry.time = (read, write, now)
+      self.__seen.add(pid)
+    #endfor
+
+    if not self.__pending:
+      for pid in self.pids.keys() - self.__seen:
+        self.__drop__(pid)
+
+      self.__pass = now
+    #endif
+
+    self.last = now
+  #sample
+
+  def top(self, key='read', k=None):
+    """
+      param: key  'read', 'write' or 'total' bytes per second
+      param: k    number of processes, by default top of the constructor
+
+      return: list of ProcEntry with the highest rates, highest first
+    """
+    rate    = self.__keys__[key]
+    entries = nlargest(k or self.top_k, self.pids.values(), key=rate)
+
+    entries = [ x for x in entries if rate(x) > 0 ]
+    for entry in entries:
+      if entry.comm is None:
+        entry.comm = self.__comm__(entry.pid)
+
+    return entries
+  #top
+
+  def __counters__(self, entry):
+    """
+      return: tuple(read_bytes, write_bytes), None if it cannot be read
+    """
+    data = self.__read__(entry)
+    if data is None:
+      return None
+
+    # rchar, wchar, syscr, syscw, read_bytes, write_bytes, cancelled_write_bytes
+    fields = data.split()
+    if len(fields) < 12:
+      return None
+
+    return int(fields[9]), int(fields[11])
+  #__counters__
+#class ProcIO
+
+
+class ProcCPU(ProcFiles):
+  """
+    utime and stime of the processes from /proc/<pid>/stat. A full scan of
+    /proc finds the processes using cpu, the samples between two full scans
+    only read the active ones, so their cost depends on the number of busy
+    processes and not on the number of pids.
+  """
+
+  filename = 'stat'
+  ticks    = os.sysconf(os.sysconf_names['SC_CLK_TCK'])
+  cpus     = os.cpu_count() or 1
+
+  def __init__(self, top=5, active=1.0, saturation=90.0, proc='/proc'):
+    """
+      param: active      % of one cpu to keep a process in the active set
+      param: saturation  % of one cpu per thread (load) counted in the streak
+                         of an entry, a process with 8 busy threads is at
+                         800% cpu and 100% load
+    """
+    ProcFiles.__init__(self, top, proc)
+
+    self.active     = set()  # pids sampled between full scans
+    self.threshold  = active
+    self.saturation = saturation
+    self.last_scan  = None   # monotonic time of the last full scan
+  #__init__
+
+  def sample(self, full=False):
+    """
+      param: full  read every pid of /proc, only the active ones otherwise.
+                   The first sample is always full
+    """
+    now  = monotonic()
+    full = full or self.last_scan is None
+    pids = [ int(x) for x in os.listdir(self.proc) if x.isdigit() ] if full else list(self.active)
+
+    for pid in pids:
+      entry = self.pids.get(pid)
+      if entry is None:
+        # started after the last full scan, not before
+        entry = self.pids[pid] = ProcCPUEntry(pid, self.last_scan)
+
+      counters = self.__counters__(entry)
+      if counters is None:
+        self.__drop__(pid)
+        self.active.discard(pid)
+        continue
+      #endif
+
+      comm, ticks, threads = counters
+      elapsed = now - entry.time if entry.time is not None else 0
+      if elapsed > 0:
+        entry.cpu = round(100 * (ticks - (entry.ticks or 0)) / self.ticks / elapsed, 2)
+
+      entry.comm, entry.ticks, entry.threads, entry.time = (comm, ticks, threads, now)
+      entry.load   = round(entry.cpu / min(max(threads, 1), self.cpus), 2)
+      entry.streak = entry.streak + 1 if entry.load >= self.saturation else 0
+
+      if entry.cpu >= self.threshold:
+        self.active.add(pid)
+      else:
+        self.active.discard(pid)
+    #endfor
+
+    if full:
+      for pid in self.pids.keys() - set(pids):
+        self.__drop__(pid)
+        self.active.discard(pid)
+
+      self.last_scan = now
+    #endif
+
+    self.last = now
+  #sample
+
+  def top(self, k=None):
+    """
+      return: list of the active ProcCPUEntry using more cpu, highest first
+    """
+    entries = nlargest(k or self.top_k, (self.pids[x] for x in self.active),
+                       key=attrgetter('cpu'))
+
+    return [ x for x in entries if x.cpu > 0 ]
+  #top
+
+  def __counters__(self, entry):
+    """
+      return: tuple(comm, utime + stime, num_threads), None if it cannot be
+              read
+    """
+    data = self.__read__(entry, 1024)
+    if not data:
+      return None
+
+    # comm can have spaces and parenthesis, it ends at the last ')'
+    end    = data.rfind(b')')
+    comm   = data[data.find(b'(') + 1: end].decode(errors='replace')
+    fields = data[end + 2:].split()
+
+    # state ppid pgrp session tty_nr tpgid flags minflt cminflt majflt cmajflt
+    # utime stime cutime cstime priority nice num_threads
+    return comm, int(fields[11]) + int(fields[12]), int(fields[17])
+  #__counters__
+#class ProcCPU
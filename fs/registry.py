@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+#
+# ./fs/registry.py
+#
+# Registry of inotify watches indexed by wd and by path
+#
+import os
+
+
+class FSWatch(object):
+  """
+    One inotify watch, linked to the watch of its parent directory
+  """
+  __slots__ = ('wd', 'path', 'wd_parent', 'flags', 'parent', 'children')
+
+  def __init__(self, wd, path, wd_parent=0, flags=0, parent=None):
+    self.wd        = wd
+    self.path      = path
+    self.wd_parent = wd_parent
+    self.flags     = flags
+    self.parent    = parent
+    self.children  = None  # { path: FSWatch }, created with the first child
+  #__init__
+
+  def __repr__(self):
+    return repr({ 'wd': self.wd, 'path': self.path, 'wd_parent': self.wd_parent,
+                  'flags': self.flags })
+#class FSWatch
+
+
+class FSWatchRegistry(object):
+  """
+    wd -> FSWatch and path -> FSWatch. Lookups, inserts and removes are
+    O(1), remove_subtree is proportional to the number of watches removed.
+  """
+
+  def __init__(self):
+    self.__wds   = {}
+    self.__paths = {}
+  #__init__
+
+  def __len__(self):
+    return len(self.__wds)
+
+  def __iter__(self):
+    return iter(list(self.__wds.values()))
+
+  def __contains__(self, path):
+    return path in self.__paths
+
+  def __repr__(self):
+    return repr(list(self.__wds.values()))
+
+  def get(self, wd):
+    return self.__wds.get(wd)
+  #get
+
+  def find(self, path):
+    return self.__paths.get(path)
+  #find
+
+  def add(self, wd, path, flags=0, wd_parent=0):
+    """
+      inotify_add_watch returns the same wd for a path already watched, the
+      previous record for wd is replaced
+    """
+    if wd in self.__wds:
+      self.remove(wd)
+
+    parent = self.__paths.get(os.path.dirname(path))
+    watch  = FSWatch(wd, path, wd_parent, flags, parent)
+
+    if parent:
+      if parent.children is None:
+        parent.children = {}
+
+      parent.children[path] = watch
+    #endif
+
+    self.__wds[wd]     = watch
+    self.__paths[path] = watch
+
+    return watch
+  #add
+
+  def remove(self, wd):
+    """
+      remove one watch, its children are kept without parent
+    """
+    watch = self.__wds.pop(wd, None)
+    if not watch:
+      return
+
+    if self.__paths.get(watch.path) is watch:
+      del self.__paths[watch.path]
+
+    if watch.parent and watch.parent.children:
+      watch.parent.children.pop(watch.path, None)
+
+    for child in (watch.children or {}).values():
+      child.parent = None
+
+    watch.parent = watch.children = None
+
+    return watch
+  #remove
+
+  def remove_subtree(self, path):
+    """
+      remove the watch of path and every watch below it
+
+      return: list of FSWatch removed
+    """
+    watch = self.__paths.get(path)
+    if not watch:
+      return []
+
+    if watch.parent and watch.parent.children:
+      watch.parent.children.pop(watch.path, None)
+
+    removed, stack = ([], [ watch ])
+    while len(stack) > 0:
+      watch = stack.pop()
+      if watch.children:
+        stack.extend(watch.children.values())
+
+      self.__wds.pop(watch.wd, None)
+      if self.__paths.get(watch.path) is watch:
+        del self.__paths[watch.path]
+
+      watch.parent = watch.children = None
+      removed.append(watch)
+    #endwhile
+
+    return removed
+  #remove_subtree
+#class FSWatchRegistry
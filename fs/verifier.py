@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+#
+# ./fs/verifier.py
+#
+# Verification of watched files (hash, entropy, database) out of the thread
+# that reads inotify
+#
+import os
+
+from threading import Thread, current_thread
+from queue     import Queue, Full
+from time      import time
+
+from fs.inotify   import *
+from fs.integrity import FSIntegrity
+from fs.crypto    import CryptoActivity
+from utils        import Logger, MetricCounter, profiler
+
+stage_verify = profiler.stage('verify')
+
+
+def verify_event(integrity, entry, mask, flag, event, count=1, buffer=None):
+  """
+    param: integrity  FSIntegrity used for the scan and the database lookup
+    param: entry      full path of the file
+    param: mask       inotify mask of the event
+    param: flag       mask & event.flags
+    param: event      watch of the directory (FSWatch)
+    param: count      events merged into this one by FSCoalescer
+    param: buffer     bytearray of FSIntegrity.buffer bytes reused by the
+                      scan, one per thread
+
+    return: tuple(log level, message)
+  """
+  start   = profiler.start()
+  verify  = mask & IN_MODIFY or mask & IN_CLOSE_WRITE or mask & IN_MOVED_TO or mask & IN_MOVED_FROM
+  tree    = None
+
+  # only files from block_min bytes have a block hash tree, the stat spares
+  # the SELECT of every smaller file (a file already gone is scanned as before)
+  if verify and integrity.blocks:
+    try:
+      large = os.stat(entry).st_size >= integrity.block_min
+    except OSError:
+      large = False
+
+    tree = integrity.get_blocks(entry.encode()) if large else None
+  #endif
+
+  # with a block hash tree only the changed blocks count in the entropy, and
+  # the digest is None if the read stopped at the first changed block
+  if tree:
+    scan = integrity.scan_blocks(entry.encode(), tree, stop=integrity.blocks == 'verdict')
+  else:
+    scan = integrity.scan(entry.encode(), digest=bool(verify), buffer=buffer)
+  entropy = scan.entropy if scan else 0.0
+  shown   = entropy
+  fsevent = FSEvent(event, flag, entry)
+
+  # entropy of a large file estimated from a few blocks
+  if scan and getattr(scan, 'confidence', 1.0) not in (None, 1.0):
+    shown = f'{entropy} (sampled, confidence {scan.confidence})'
+
+  result  = (-1, f'{fsevent.events_name} to `{entry}`, entropy {shown}')
+
+  if verify:
+    if scan:
+      CryptoActivity.written(entropy)
+
+    info = integrity.get(entry.encode())
+    hash = scan.digest if scan else None
+
+    if not (info and info['hash'] == hash):
+      result = (-2, f'{fsevent.events_name} `{entry}`, entropy {shown}')
+
+      if info and info['hash'] != hash:
+        result = (-3, f'{fsevent.events_name} `{entry}` has been modified, entropy {shown}')
+
+      if info and tree and scan and scan.changed:
+        result = (-3, f'{result[1]}, changed bytes {integrity.ranges(scan.changed)}')
+    #endif
+  #endif
+
+  if mask & IN_DELETE:
+    result = (-3 , f'{fsevent.events_name} to `{entry}`, entropy {shown}')
+
+  if count > 1:
+    result = (result[0], f'{result[1]}, {count} events')
+
+  profiler.stop(stage_verify, start)
+  return result
+#verify_event
+
+
+class FSVerifier(object):
+  """
+    Pool of threads running verify_event. Every worker has its own bounded
+    queue and FSIntegrity (sqlite connection), a path is always sent to the
+    same worker so the alerts of one path are emitted in order.
+  """
+
+  warning_interval = 10  # seconds between backpressure warnings
+
+  def __init__(self, workers=2, maxsize=1024):
+    self.workers = workers
+    self.queues  = [ Queue(maxsize) for _ in range(workers) ]
+    self.threads = []
+
+    self.submitted    = 0
+    self.verified     = MetricCounter('processed')  # incremented by every worker
+    self.backpressure = 0  # submits that found the queue full and waited
+
+    self.logger = Logger()
+    self.__last_warning = 0
+  #__init__
+
+  def start(self):
+    for n in range(self.workers):
+      th = Thread(name=f'FSVerifier-{n}', target=self.__worker, args=(self.queues[n],))
+      th.start()
+      self.threads.append(th)
+    #endfor
+  #start
+
+  def stop(self):
+    """
+      the pending items are verified before the workers exit
+    """
+    for q in self.queues:
+      q.put(None)
+
+    for th in self.threads:
+      th.join()
+
+    self.threads = []
+  #stop
+
+  def submit(self, entry, mask, flag, event, count=1):
+    q    = self.queues[hash(entry) % self.workers]
+    item = (entry, mask, flag, event, count)
+
+    try:
+      q.put_nowait(item)
+    except Full:
+      self.backpressure += 1
+      if time() - self.__last_warning >= self.warning_interval:
+        self.__last_warning = time()
+        self.logger.log((-2, f'verification queue full, depth {self.depth}, ' + \
+                             f'backpressure {self.backpressure}'))
+      #endif
+
+      q.put(item)
+    #endtry
+
+    self.submitted += 1
+  #submit
+
+  @property
+  def processed(self):
+    return self.verified.value
+
+  @property
+  def depth(self):
+    return sum(q.qsize() for q in self.queues)
+
+  def stats(self):
+    return {
+      'workers': self.workers,
+      'depth': self.depth,
+      'submitted': self.submitted,
+      'processed': self.processed,
+      'backpressure': self.backpressure
+    }
+  #stats
+
+  def __worker(self, q):
+    logger    = Logger()
+    buffer    = bytearray(FSIntegrity.buffer)
+
+    # without database the queue is still drained, submit() would block
+    try:
+      integrity = FSIntegrity()
+    except OSError as err:
+      integrity = None
+      logger.log((-3, f'{current_thread().name} cannot verify files, {err}'))
+
+    while True:
+      item = q.get()
+      if item is None:
+        break
+
+      profiler.checkpoint()
+
+      # an error of one item does not end the worker, its queue would never
+      # be drained and submit() would block
+      try:
+        if integrity is None:
+          logger.log((-3, f'`{item[0]}` not verified, no integrity database'))
+        else:
+          logger.log(verify_event(integrity, *item, buffer=buffer))
+      except OSError as err:
+        logger.log((-2, f'{err}, {item[0]}'))
+      except Exception as err:
+        logger.log((-3, f'verification of {item[0]} failed, {type(err).__name__}: {err}'))
+
+      self.verified.inc()
+    #endwhile
+  #__worker
+#class FSVerifier
@@ -18,17 +18,54 @@
         'delete self'
         'move from'
         'move to'
+        'close write', modified files are verified once when closed
+    -close-timeout seconds, default 30. With 'close write', a file still open
+        is verified this time after the first write
     -init-integrity
+    -jobs number of processes hashing files, default 1
+    -paranoid hash every file at startup, by default only files whose
+        size, mtime, ctime or inode changed are hashed
+    -workers number of threads verifying files, default 2, 0 verifies in
+        the thread reading events
+    -coalesce quiet,max milliseconds, default 250,2000. Events of a file are
+        merged until no event arrived for quiet ms, at most max ms after
+        the first one. 0 verifies every event
+    -io-abuse device:metric:window:warning:critical,... default
+        *:rb/s:10:1048576:10485760, *:wb/s the same and *:iops:10:1000:10000.
+        metric rb/s, wb/s (bytes) or iops, window in seconds, device * sets
+        every disk, partitions are only checked with their own limits.
+        Empty values keep the default, e.g. sda1:wb/s::2097152:
+    -entropy exact:sample:rate:block, default 8:1024:64:64. The entropy of
+        files larger than exact MB is estimated from sample KB per file
+        (head, tail and blocks of block KB at offsets seeded by the inode),
+        at most rate MB/s sampled overall, 0 unlimited. The rate only bounds
+        the sampled reads, the SHA-256 of a verified file reads all of it.
+        Empty values keep the default, e.g. -entropy 32::16:
+    -blocks policy:algorithm:block:min, default disabled. Files from min MB
+        (default 64) keep a hash tree of blocks of block KB (default 1024)
+        with algorithm blake2b (default), blake2s, sha256 or sha1. Policy
+        ranges reports the changed byte ranges of a modified file, verdict
+        stops reading at the first changed block, e.g. -blocks verdict::4096:
+    -profile time the stages of the hot path (parse, handler, verify, hash,
+        entropy, sqlite, logger), dumped to the log on exit. SIGUSR1 dumps
+        them (and enables the timers), SIGUSR2 starts or stops a cProfile
+        session of 60 s written next to the log file
+    -maxmemory MB of resident memory, default 100. From 80% caches and
+        pending events are reduced, from 90% the integrity scan is paused
+    -metrics path of a unix socket serving counters and gauges as text,
+        or json if the client sends 'json'. Disabled by default
+    -backend inotify or fanotify, default inotify. fanotify marks the whole
+        filesystem of every path, no watch per directory
     -logfile default, {logfile}
     -help
 """
-import sys, os
+import sys, os, signal
 
 from threading import Thread
 from time      import time, sleep, strftime, localtime
 
-from utils import Logger, explore
-from fs    import FSEvent, FSWatcher, FSWatcherError, FSIntegrity, FSIntegrityError, \
+from utils import Logger, MetricsServer, explore, memory_governor, profiler, entropy_sampler
+from fs    import FSEvent, FSWatcher, FSFanotifyWatcher, FSWatcherError, FSIntegrity, FSIntegrityError, \
                   IOStats
 
 
@@ -38,10 +75,21 @@ class args:
   basepath = os.path.dirname(os.path.abspath(sys.argv[0]))
 
   init_integrity = False
+  jobs           = 1
+  paranoid       = False
+  workers        = 2
+  coalesce       = (250, 2000) # ms
+  close_timeout  = 30          # seconds
+  backend        = 'inotify'   # inotify, fanotify
+  io_limits      = {}          # { device: { metric: (window, warning, critical) } }
+  metrics        = None        # unix socket of MetricsServer
 
   watchpath  = None
   extensions = []
   maxmemory  = 100 # MB
+  profile    = False
+  blocks     = None  # (policy, algorithm, block KB, min MB)
+  entropy    = None  # (exact MB, sample KB, rate MB/s, block KB)
 
   events = [
     'modify',
@@ -63,13 +111,40 @@ def main():
   logger = Logger()
   logger.debug(f'args {args.__dict__}')
 
+  memory_governor.limit = args.maxmemory * 1024 * 1024
+  memory_governor.start()
+
+  # SIGUSR1 dumps the stage timers, SIGUSR2 starts or stops a cProfile session
+  profiler.enable(args.profile)
+  profiler.directory = os.path.dirname(os.path.abspath(args.logfile))
+  signal.signal(signal.SIGUSR1, lambda *_: dump_stages(logger))
+  signal.signal(signal.SIGUSR2, lambda *_: profiler.toggle_profile(60, logger))
+
+  if args.entropy:
+    exact, sample, rate, block = args.entropy
+    entropy_sampler.exact    = exact * 1024 * 1024
+    entropy_sampler.per_file = sample * 1024
+    entropy_sampler.rate     = rate * 1024 * 1024
+    entropy_sampler.block    = block * 1024
+  #endif
+
+  if args.blocks:
+    FSIntegrity.blocks, FSIntegrity.block_algorithm = args.blocks[:2]
+    FSIntegrity.block_size = args.blocks[2] * 1024
+    FSIntegrity.block_min  = args.blocks[3] * 1024 * 1024
+  #endif
+
   integrity = FSIntegrity(args.init_integrity)
   if args.init_integrity:
-    [ integrity.run(path) for path in args.watchpath ]
+    [ integrity.run(path, jobs=args.jobs) for path in args.watchpath ]
     logger.halt('finish')
 
-  watchers  = FSWatcher(args.extensions)
   flags     = FSEvent.get_flags(FSEvent, args.events)
+  backend   = FSFanotifyWatcher if args.backend == 'fanotify' else FSWatcher
+  watchers  = backend(args.extensions, workers=args.workers,
+                      quiet=args.coalesce[0] / 1000, maxdelay=args.coalesce[-1] / 1000,
+                      verify_on_close=FSEvent.verify_on_close(FSEvent, flags),
+                      close_timeout=args.close_timeout)
 
   logger.log((-1, f'running integrity file system'))
 
@@ -82,9 +157,12 @@ def main():
       logger.log((-1, f'check integrity files in {path}'))
       sleep(1)
 
-      integrity.run(path)
+      integrity.run(path, jobs=args.jobs, paranoid=args.paranoid)
 
-      paths = [ path ] + [ x for x in explore(path, directory=True) ]
+      # a fanotify mark covers the subdirectories
+      paths = [ path ]
+      if args.backend == 'inotify':
+        paths += [ x for x in explore(path, directory=True) ]
 
       for p in paths:
         logger.log((-1, f'running watcher, {p}'))
@@ -102,11 +180,20 @@ def main():
 
   logger.log((-1, f'end integrity'))
 
-  io = IOStats(interval=1)
+  io = IOStats(interval=1, limits=args.io_limits)
 
   if len(notfound) == len(args.watchpath):
     logger.halt(f'paths not found')
 
+  try:
+    server = MetricsServer(args.metrics) if args.metrics else None
+  except OSError as err:
+    logger.halt(f'ERROR: metrics socket {args.metrics} not valid, {err.strerror}')
+
+  if server:
+    logger.log((-1, f'metrics in {args.metrics}'))
+    server.start()
+
   thiostats = Thread(name='IOStats', target=io.loop)
   thmonitor = Thread(name='FSWatcher', target=watchers.loop)
 
@@ -127,12 +214,20 @@ def main():
 
       thiostats.join()
       thmonitor.join()
+
+      if server:
+        server.stop()
+
+      if profiler.enabled:
+        profiler.dump(logger)
+
+      memory_governor.stop()
       break
   #endwhile
 #main
 
 def parse_arguments():
-  options_ = [ '-event', '-logfile', '-init-integrity', '-help' ]
+  options_ = [ '-event', '-logfile', '-init-integrity', '-jobs', '-paranoid', '-workers', '-coalesce', '-close-timeout', '-backend', '-io-abuse', '-metrics', '-maxmemory', '-profile', '-blocks', '-entropy', '-help' ]
   options  = sys.argv[1:]
 
   logger = Logger()
@@ -143,13 +238,30 @@ def parse_arguments():
 
   while len(options) > 0:
     data = options.pop(0)
-    if data in ['-events', '-logfile']:
+    if data in ['-events', '-logfile', '-jobs', '-workers', '-coalesce', '-close-timeout', '-backend', '-io-abuse', '-metrics', '-maxmemory', '-blocks', '-entropy']:
+      if not options:
+        logger.halt(f'ERROR: {data} without value')
+
       value = options.pop(0)
       if data == '-events' :     events       = value.split(',')
       if data == '-logfile':     args.logfile = value
+      if data == '-jobs'   :     args.jobs    = parse_int(data, value)
+      if data == '-workers':     args.workers = parse_int(data, value, 0)
+      if data == '-coalesce':    args.coalesce = parse_coalesce(value)
+      if data == '-close-timeout': args.close_timeout = parse_int(data, value)
+      if data == '-backend':     args.backend = value
+      if data == '-io-abuse':    args.io_limits = parse_io_limits(value)
+      if data == '-metrics':     args.metrics = os.path.abspath(value)
+      if data == '-maxmemory':   args.maxmemory = parse_int(data, value)
+      if data == '-blocks':      args.blocks = parse_blocks(value)
+      if data == '-entropy':     args.entropy = parse_entropy(value)
 
     elif data == '-init-integrity':
       args.init_integrity = True
+    elif data == '-paranoid':
+      args.paranoid = True
+    elif data == '-profile':
+      args.profile = True
     elif data == '-help':
       logger.halt_with_doc('', __doc__.format(program=args.program,
                                               logfile=args.logfile))
@@ -173,14 +285,134 @@ def parse_arguments():
         logger.log((-2, f'ERROR: {path} not found'))
 
   for event in events:
-    if event not in args.events:
+    if event not in args.events + [ 'close write' ]:
       logger.halt(f'ERROR: {event} not recognized')
   #endfor
 
   if len(events) > 0:
     args.events = events
+
+  if args.backend not in [ 'inotify', 'fanotify' ]:
+    logger.halt(f'ERROR: backend {args.backend} not recognized')
 #parse_arguments
 
+def dump_stages(logger):
+  """
+    SIGUSR1, the first signal enables the timers if -profile was not set
+  """
+  if not profiler.enabled:
+    profiler.enable()
+    logger.log((-1, 'stage timers enabled, send SIGUSR1 again to dump them'))
+    return
+  #endif
+
+  profiler.dump(logger)
+#dump_stages
+
+def parse_int(option, value, minimum=1):
+  """
+    return: value as int, halts if it is not a number or is under minimum
+  """
+  try:
+    number = int(value)
+  except ValueError:
+    number = None
+
+  if number is None or number < minimum:
+    Logger().halt(f'ERROR: {option} {value} not valid')
+
+  return number
+#parse_int
+
+def parse_coalesce(value):
+  """
+    param: value  quiet,max milliseconds, quiet alone is also the max
+
+    return: tuple(quiet, max)
+  """
+  fields = value.split(',')
+  if len(fields) > 2:
+    Logger().halt(f'ERROR: -coalesce {value} not valid')
+
+  quiet, maximum = (parse_int('-coalesce', x, 0) for x in (fields[0], fields[-1]))
+  if maximum < quiet:
+    Logger().halt(f'ERROR: -coalesce {value} not valid, max under quiet')
+
+  return quiet, maximum
+#parse_coalesce
+
+def parse_blocks(value):
+  """
+    param: value  policy:algorithm:block:min, empty values keep the default
+
+    return: tuple(policy, algorithm, block KB, min MB)
+  """
+  fields  = (value.split(':') + [ '' ] * 4)[:4]
+  default = ('ranges', FSIntegrity.block_algorithm,
+             FSIntegrity.block_size // 1024, FSIntegrity.block_min // 1024 // 1024)
+
+  try:
+    policy, algorithm, block, minimum = (x or y for x, y in zip(fields, default))
+    block, minimum = (int(block), int(minimum))
+  except ValueError:
+    Logger().halt(f'ERROR: -blocks {value} not valid')
+
+  if policy not in [ 'ranges', 'verdict' ] or algorithm not in FSIntegrity.algorithms or \
+     block <= 0 or block % 4 or minimum < 0:
+    Logger().halt(f'ERROR: -blocks {value} not valid')
+
+  return policy, algorithm, block, minimum
+#parse_blocks
+
+def parse_entropy(value):
+  """
+    param: value  exact:sample:rate:block, empty values keep the default
+
+    return: tuple(exact MB, sample KB, rate MB/s, block KB)
+  """
+  fields  = (value.split(':') + [ '' ] * 4)[:4]
+  default = (entropy_sampler.exact // 1024 // 1024, entropy_sampler.per_file // 1024,
+             entropy_sampler.rate // 1024 // 1024, entropy_sampler.block // 1024)
+
+  try:
+    exact, sample, rate, block = (int(x) if x else y for x, y in zip(fields, default))
+  except ValueError:
+    Logger().halt(f'ERROR: -entropy {value} not valid')
+
+  if exact < 0 or rate < 0 or block <= 0 or block % 4 or sample < block:
+    Logger().halt(f'ERROR: -entropy {value} not valid')
+
+  return exact, sample, rate, block
+#parse_entropy
+
+def parse_io_limits(value):
+  """
+    param: value  device:metric:window:warning:critical,...
+
+    return: dict { device: { metric: (window, warning, critical) } }
+  """
+  limits = {}
+  for limit in value.split(','):
+    fields = limit.strip().split(':')
+    if len(fields) != 5 or fields[1] not in [ 'rb/s', 'wb/s', 'iops' ]:
+      Logger().halt(f'ERROR: -io-abuse {limit} not valid')
+
+    device, metric = fields[:2]
+    try:
+      window, warning, critical = (int(x) if x else None for x in fields[2:])
+    except ValueError:
+      Logger().halt(f'ERROR: -io-abuse {limit} not valid')
+
+    # a window of at least one sample, thresholds are not negative
+    if (window is not None and window < 1) or any(x is not None and x < 0 for x in (warning, critical)):
+      Logger().halt(f'ERROR: -io-abuse {limit} not valid')
+
+    limits.setdefault(device, {})[metric] = (window, warning, critical)
+  #endfor
+
+  return limits
+#parse_io_limits
+
 
 if __name__ == "__main__":
   try:    reload(sys); sys.setdefaultencoding("utf8")
@@ -1,3 +1,6 @@
+from .profiling import *
 from .logger    import *
 from .utils     import *
+from .metrics   import *
+from .memory    import *
 from .dbsqlite3 import dbSQLite
@@ -9,20 +9,48 @@
 import os
 import sqlite3
 
-from utils import Logger
+from utils import Logger, chunked, memory_governor
 
 
 class dbSQLite(object):
 
-  result = None
+  result     = None
+  batch_size = 1000  # rows per executemany transaction
 
-  def __init__(self, dbfile):
+  cache_limit = None # cache_size of every connection, set by the memory governor
+  cache_bytes = 0    # cache of the connections, set by tune
+
+  def __init__(self, dbfile, batch_size=None):
     self.dbfile  = dbfile
     self.logger  = Logger()
 
+    self.batch_size = batch_size if batch_size else self.batch_size
+    self.pending    = {}
+
+    self.cache_size    = -2000  # sqlite default
+    self.__cache_limit = None   # cache_limit applied to this connection
+    dbSQLite.cache_bytes += self.__cache_bytes__(self.cache_size)
+
     self.connect = sqlite3
   #__init__
 
+  def tune(self, journal_mode='WAL', synchronous='NORMAL', cache_size=-8192):
+    """
+      param: journal_mode  DELETE, TRUNCATE, PERSIST, MEMORY, WAL or OFF
+      param: synchronous   OFF, NORMAL, FULL or EXTRA
+      param: cache_size    pages, or KiB if negative (default 8 MB)
+    """
+    self.cur.execute(f'PRAGMA journal_mode = {journal_mode}')
+    self.cur.execute(f'PRAGMA synchronous = {synchronous}')
+    self.cur.execute(f'PRAGMA cache_size = {int(cache_size)}')
+
+    dbSQLite.cache_bytes += self.__cache_bytes__(cache_size) - self.__cache_bytes__(self.cache_size)
+    self.cache_size = cache_size
+
+    self.logger.debug(f'journal_mode {journal_mode}, synchronous {synchronous}, ' + \
+                      f'cache_size {cache_size}')
+  #tune
+
   def to_dict(self, cur, row):
     out = {}
     for idx, field in enumerate(cur.description):
@@ -38,7 +66,38 @@ class dbSQLite(object):
     return sql, ()
   #parse
 
+  @classmethod
+  def shrink(cls, cache_size=-1024):
+    """
+      cache of every connection to cache_size, applied by the thread of each
+      connection on its next query
+    """
+    cls.cache_limit = cache_size
+  #shrink
+
+  def __check_cache__(self):
+    limit = dbSQLite.cache_limit
+    if limit == self.__cache_limit:
+      return
+
+    self.__cache_limit = limit
+    if limit is not None and self.__cache_bytes__(limit) < self.__cache_bytes__(self.cache_size):
+      self.cur.execute(f'PRAGMA cache_size = {int(limit)}')
+      self.cur.execute('PRAGMA shrink_memory')
+
+      dbSQLite.cache_bytes += self.__cache_bytes__(limit) - self.__cache_bytes__(self.cache_size)
+      self.cache_size = limit
+    #endif
+  #__check_cache__
+
+  @staticmethod
+  def __cache_bytes__(cache_size):
+    # pages of 4 KiB, or KiB if negative
+    return -cache_size * 1024 if cache_size < 0 else cache_size * 4096
+  #__cache_bytes__
+
   def fetchone(self, sql):
+    self.__check_cache__()
     sql, params = self.parse(sql)
 
     self.cur.execute(sql, (params))
@@ -59,6 +118,39 @@ class dbSQLite(object):
     self.connect.commit()
   #insert
 
+  def insertmany(self, sql, rows, batch_size=None):
+    """
+      executemany over rows, one transaction for every batch_size rows
+    """
+    self.__check_cache__()
+    for batch in chunked(rows, batch_size if batch_size else self.batch_size):
+      with self.connect:
+        self.cur.executemany(sql, batch)
+    #endfor
+  #insertmany
+
+  def append(self, sql):
+    """
+      queue the statement, it is written with insertmany when batch_size
+      statements with the same sql are pending or on flush()
+    """
+    sql, params = self.parse(sql)
+
+    rows = self.pending.setdefault(sql, [])
+    rows.append(params)
+
+    if len(rows) >= self.batch_size:
+      self.flush(sql)
+  #append
+
+  def flush(self, sql=None):
+    for key in ([ sql ] if sql else list(self.pending.keys())):
+      rows = self.pending.pop(key, [])
+      if rows:
+        self.insertmany(key, rows)
+    #endfor
+  #flush
+
   @property
   def cur(self):
     return self._cur
@@ -93,6 +185,9 @@ class dbSQLite(object):
 #class dbSQLite
 
 
+memory_governor.register('sqlite', lambda: dbSQLite.cache_bytes, 0.3, dbSQLite.shrink)
+
+
 class dbSQLiteException(Exception):
   def __init__(self, msg):      self.msg = msg
   def __str__(self):            return repr(self.msg)
@@ -6,15 +6,41 @@
 #
 # logger
 #
-import sys, os
+import sys, os, atexit
 
-from time import strftime, localtime
+from threading import Thread, Lock
+from queue     import SimpleQueue, Empty
+from time      import time, monotonic, sleep, strftime, localtime
+
+from utils.profiling import profiler
+
+stage_logger = profiler.stage('logger')
+
+
+class Colors:
+  RED    = '\033[31m'
+  GREEN  = '\033[32m'
+  YELLOW = '\033[33m'
+  BLUE   = '\033[34m'
+
+  BOLD = '\033[;1m'
+  ENDC = '\033[m'
+#class Colors
 
 
 class Logger:
 
-  fd = None
   logfile = None
+  writer  = None  # LogWriter shared by every Logger, started by setlogfile
+
+  __lock = Lock()
+  __exit = False  # shutdown registered in atexit
+
+  __levels = {
+    -1: ('Ok - ', Colors.GREEN),
+    -2: ('WARNING - ', Colors.YELLOW),
+    -3: ('CRITICAL - ', Colors.RED)
+  }
 
   def __init__(self):
     self.__verbose = bool(os.environ.get('VERBOSE', False))
@@ -24,48 +50,31 @@ class Logger:
     self.endc  = Colors.ENDC
     self.setlogfile()
 
-  def __logging(self, msg):
-    msg = msg.rstrip()
-    tm  = strftime("%Y-%m-%d %H:%M:%S ", localtime())
-
-    if self.__debug and not self.__verbose or self.__verbose:
-      sys.stdout.write(f'{tm} --> {self.color}{msg}{self.endc}\n')
-
-    if self.fd:
-      self.fd.write(f'{tm} --> {msg}\n')
-      self.fd.flush()
-      self.fd.seek(0)
+  def __logging(self, msg, color=None):
+    # the record is formatted and written by the writer thread, the caller
+    # only puts it in a queue
+    stdout = self.__debug and not self.__verbose or self.__verbose
+    record = (time(), msg.rstrip(), color, stdout)
 
+    if self.writer is not None:
+      self.writer.put(record)
+    elif stdout:
+      LogWriter.write_stdout([ record ])
   #__logging
 
   def log(self, _msg):
-    def success(msg):
-      self.color = Colors.GREEN
-      self.__logging(f'Ok - {msg}')
-    #success
-
-    def warning(msg):
-      self.color = Colors.YELLOW
-      self.__logging(f'WARNING - {msg}')
-    #warning
-
-    def error(msg):
-      self.color = Colors.RED
-      self.__logging(f'CRITICAL - {msg}')
-    #error
-
-    log = { -1: success, -2: warning, -3: error }
-
-    log[_msg[0]](_msg[1])
+    prefix, color = self.__levels[_msg[0]]
+    self.__logging(f'{prefix}{_msg[1]}', color)
   #log
 
   def debug(self, msg):
-    self.color = Colors.BOLD
     if self.__debug:
-      self.__logging(f'DEBUG {msg}')
+      self.__logging(f'DEBUG {msg}', Colors.BOLD)
   #debug
 
   def halt(self, msg, code=0):
+    self.shutdown()
+
     self.color = Colors.BOLD
     sys.stdout.write(f'{self.color}{msg}{self.endc}\n')
     sys.exit(code)
@@ -76,15 +85,46 @@ class Logger:
   #halt_with_doc
 
   def setlogfile(self):
-    if self.logfile:
+    """
+      start the writer of Logger.logfile, once for every Logger
+    """
+    if not self.logfile:
+      return
+
+    with Logger.__lock:
+      writer = Logger.writer
+      if writer is not None and writer.logfile == self.logfile:
+        return
+
       logdirectory = os.path.dirname(self.logfile)
       if not os.path.exists(logdirectory):
         os.makedirs(logdirectory)
 
-      self.fd = open(self.logfile, 'a+')
-    #endif
+      Logger.writer = LogWriter(self.logfile)
+      Logger.writer.start()
+
+      if writer is not None:
+        writer.stop()
+
+      # a writer started after a shutdown (halt) does not register it again
+      if not Logger.__exit:
+        atexit.register(Logger.shutdown)
+        Logger.__exit = True
+    #endwith
   #setlogfile
 
+  @staticmethod
+  def shutdown():
+    """
+      write the records in the queue and stop the writer
+    """
+    with Logger.__lock:
+      writer, Logger.writer = (Logger.writer, None)
+
+    if writer is not None:
+      writer.stop()
+  #shutdown
+
   @property
   def verbose(self):
     return self.__verbose
@@ -95,12 +135,187 @@ class Logger:
 #class Logger
 
 
-class Colors:
-  RED    = '\033[31m'
-  GREEN  = '\033[32m'
-  YELLOW = '\033[33m'
-  BLUE   = '\033[34m'
+class LogWriter(Thread):
+  """
+    Thread writing the records of every Logger to the log file. Records are
+    written in batches, the file is flushed every `batch` records or every
+    `interval` seconds and rotated to logfile.1 .. logfile.<backups> when it
+    reaches max_bytes. With max_records queued the new Ok and DEBUG records
+    are dropped and counted, the next write logs how many. A WARNING or
+    CRITICAL record is never dropped: put() waits up to max_wait for the
+    writer to drain the queue and then queues it over the bound (spilled).
+    A write or rotation that fails is reported to stderr, its records are
+    lost and the queue is still drained.
+  """
 
-  BOLD = '\033[;1m'
-  ENDC = '\033[m'
-#class Colors
+  batch     = 1024               # records per write and flush
+  interval  = 1.0                # seconds between flushes
+  max_bytes = 50 * 1024 * 1024   # 0 disables the rotation
+  backups   = 5
+  max_records = 16384            # queued records, about 4 MB (0 unbounded)
+  max_wait    = 0.5              # seconds an alert waits for a full queue
+
+  alerts = (Colors.YELLOW, Colors.RED)   # colors of the WARNING and CRITICAL records
+
+  __time = (None, '')            # (second, timestamp) of the last record
+
+  def __init__(self, logfile):
+    Thread.__init__(self, name='LogWriter', daemon=True)
+
+    self.logfile = logfile
+    self.queue   = SimpleQueue()
+    self.written = 0
+    self.lost    = 0   # records of the writes that failed
+    self.dropped = 0   # Ok and DEBUG records put with the queue full
+    self.spilled = 0   # alerts queued over max_records
+    self.fd      = open(self.logfile, 'a')
+
+    self.__reported = 0      # dropped already logged
+    self.__stalled  = False  # the last wait timed out, alerts do not wait
+    self.__lock     = Lock()
+  #__init__
+
+  def put(self, record):
+    """
+      param: record  tuple(time, message, color, stdout)
+    """
+    if self.max_records and self.queue.qsize() >= self.max_records:
+      if record[2] not in self.alerts:
+        with self.__lock:
+          self.dropped += 1
+        return
+      #endif
+
+      # the caller waits for the writer, unless it did not drain the queue
+      # in the last wait (disk hung), then the alert is queued at once
+      deadline = monotonic() + (0 if self.__stalled else self.max_wait)
+      while self.queue.qsize() >= self.max_records and monotonic() < deadline:
+        sleep(0.001)
+
+      self.__stalled = self.queue.qsize() >= self.max_records
+      if self.__stalled:
+        with self.__lock:
+          self.spilled += 1
+    elif self.__stalled:
+      self.__stalled = False
+    #endif
+
+    self.queue.put(record)
+  #put
+
+  def stop(self):
+    self.queue.put(None)
+    self.join()
+  #stop
+
+  def run(self):
+    records, last, running = ([], monotonic(), True)
+    while running:
+      profiler.checkpoint()
+      try:
+        timeout = max(self.interval - (monotonic() - last), 0.01)
+        record  = self.queue.get(timeout=timeout)
+        while record is not None:
+          records.append(record)
+          if len(records) >= self.batch:
+            break
+
+          record = self.queue.get_nowait()
+        #endwhile
+
+        running = record is not None
+      except Empty:
+        pass
+
+      if records and (len(records) >= self.batch or not running or
+                      monotonic() - last >= self.interval):
+        try:
+          self.write(records)
+        except (OSError, ValueError) as err:   # ValueError, fd left closed by rotate
+          self.error(err, records)
+
+        records, last = ([], monotonic())
+      elif not records:
+        last = monotonic()
+    #endwhile
+
+    self.fd.close()
+  #run
+
+  def write(self, records):
+    start = profiler.start()
+
+    dropped = self.dropped - self.__reported
+    if dropped:
+      self.__reported += dropped
+      records.append((records[-1][0], f'WARNING - log queue full, {dropped} records dropped ' + \
+                                      f'({self.dropped} in total)', None, False))
+    #endif
+
+    self.write_stdout([ x for x in records if x[3] ])
+
+    self.fd.write(''.join(f'{self.timestamp(x[0])} --> {x[1]}\n' for x in records))
+    self.fd.flush()
+    self.written += len(records)
+
+    # the records are written, a failed rotation loses none of them
+    if self.max_bytes and self.fd.tell() >= self.max_bytes:
+      try:
+        self.rotate()
+      except OSError as err:
+        self.error(err, [])
+
+    profiler.stop(stage_logger, start)
+  #write
+
+  def error(self, err, records):
+    """
+      report a failed write to stderr and open the log file again if the
+      rotation closed it
+    """
+    self.lost += len(records)
+    sys.stderr.write(f'LogWriter: {self.logfile}, {err}, {len(records)} records lost ' + \
+                     f'({self.lost} in total)\n')
+    sys.stderr.flush()
+
+    if self.fd.closed:
+      try:
+        self.fd = open(self.logfile, 'a')
+      except OSError:
+        pass # next write fails on the closed fd and tries again
+  #error
+
+  def rotate(self):
+    self.fd.close()
+
+    for n in range(self.backups - 1, 0, -1):
+      if os.path.exists(f'{self.logfile}.{n}'):
+        os.replace(f'{self.logfile}.{n}', f'{self.logfile}.{n + 1}')
+
+    if self.backups > 0:
+      os.replace(self.logfile, f'{self.logfile}.1')
+    else:
+      os.truncate(self.logfile, 0)
+
+    self.fd = open(self.logfile, 'a')
+  #rotate
+
+  @classmethod
+  def timestamp(cls, t):
+    """
+      strftime once per second
+    """
+    second = int(t)
+    if cls.__time[0] != second:
+      cls.__time = (second, strftime("%Y-%m-%d %H:%M:%S ", localtime(second)))
+
+    return cls.__time[1]
+  #timestamp
+
+  @classmethod
+  def write_stdout(cls, records):
+    if records:
+      sys.stdout.write(''.join(f'{cls.timestamp(t)} --> {color}{msg}{Colors.ENDC}\n'
+                               for t, msg, color, _ in records))
+  #write_stdout
+#class LogWriter
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+#
+# ./utils/memory.py
+#
+# Memory governor, RSS of the process against the budget of irondome
+#
+import os
+
+from threading import Thread, Event, Lock
+from time      import monotonic
+
+from utils.logger  import Logger
+from utils.metrics import metrics_registry
+
+
+class MemoryGovernor(Thread):
+  """
+    Samples the RSS of the process from /proc/self/statm every interval.
+    From soft * limit the subsystems over their budget are asked to shrink
+    (caches, pending events), from hard * limit `pressure` is set and wait()
+    blocks the producers (baseline scan) until the RSS is under soft again.
+    Freed memory is not always given back to the system, producers are
+    paused for at most max_pause seconds, the limit is then reported as not
+    held and they go on until the RSS is under soft once.
+  """
+
+  page_size = os.sysconf('SC_PAGE_SIZE')
+
+  def __init__(self, limit=100, interval=1.0, soft=0.8, hard=0.9, max_pause=10.0):
+    """
+      param: limit      MB of RSS
+      param: interval   seconds between two samples
+      param: soft       fraction of limit to shrink the subsystems
+      param: hard       fraction of limit to stop the producers
+      param: max_pause  seconds the producers wait for the RSS to go down
+    """
+    Thread.__init__(self, name='MemoryGovernor', daemon=True)
+
+    self.limit     = limit * 1024 * 1024
+    self.interval  = interval
+    self.soft      = soft
+    self.hard      = hard
+    self.max_pause = max_pause
+
+    self.rss      = 0
+    self.peak     = 0
+    self.pressure = False    # over hard, producers wait
+    self.shrinks  = 0        # times the subsystems were asked to shrink
+    self.pauses   = 0        # times the producers were paused
+    self.paused   = None     # monotonic time of the pause
+    self.exceeded = False    # pause expired, no new pause until under soft
+    self.subsystems = {}     # name -> (usage, budget, shrink)
+
+    self.terminate = False
+    self.logger    = Logger()
+
+    self.__relief = Event()  # set while there is no pressure
+    self.__relief.set()
+    self.__stop   = Event()
+    self.__lock   = Lock()
+    self.__statm  = os.open('/proc/self/statm', os.O_RDONLY | os.O_CLOEXEC)
+
+    metrics_registry.gauge('memory_rss_bytes', 'resident memory of the process',
+                           lambda: self.rss)
+    metrics_registry.gauge('memory_limit_bytes', 'memory budget of the process',
+                           lambda: self.limit)
+    metrics_registry.gauge('memory_usage_bytes', 'estimated memory of every subsystem',
+                           self.usage, label='subsystem')
+    metrics_registry.gauge('memory_budget_bytes', 'budget of every subsystem',
+                           lambda: { x: self.budget(x) for x in list(self.subsystems) },
+                           label='subsystem')
+  #__init__
+
+  def register(self, name, usage, budget=0.1, shrink=None):
+    """
+      param: name    subsystem
+      param: usage   function, estimated bytes of the subsystem
+      param: budget  fraction of limit (<= 1) or bytes
+      param: shrink  function called when the subsystem is over its budget
+                     and the process over soft * limit
+    """
+    with self.__lock:
+      self.subsystems[name] = (usage, budget, shrink)
+  #register
+
+  def budget(self, name):
+    """
+      return: bytes of the budget of the subsystem
+    """
+    budget = self.subsystems[name][1]
+    return int(budget * self.limit) if budget <= 1 else int(budget)
+  #budget
+
+  def usage(self):
+    """
+      return: dict { subsystem: estimated bytes }
+    """
+    out = {}
+    for name, (usage, _, _) in list(self.subsystems.items()):
+      try:
+        out[name] = int(usage())
+      except Exception:
+        out[name] = 0
+    #endfor
+
+    return out
+  #usage
+
+  def sample(self):
+    """
+      return: RSS in bytes, from /proc/self/statm (size resident shared ...)
+    """
+    self.rss  = int(os.pread(self.__statm, 128, 0).split()[1]) * self.page_size
+    self.peak = max(self.peak, self.rss)
+
+    return self.rss
+  #sample
+
+  def check(self):
+    """
+      one sample, shrink the subsystems over budget and set the pressure
+    """
+    rss = self.sample()
+
+    if rss >= self.soft * self.limit:
+      self.shrink()
+
+    if rss >= self.hard * self.limit and not (self.pressure or self.exceeded):
+      self.pressure = True
+      self.paused   = monotonic()
+      self.pauses  += 1
+      self.__relief.clear()
+      self.logger.log((-2, f'memory {self.mb(rss)} MB of {self.mb(self.limit)} MB, ' + \
+                           f'producers paused, usage {self.__usage_mb__()}'))
+    elif rss < self.soft * self.limit and (self.pressure or self.exceeded):
+      self.pressure = self.exceeded = False
+      self.__relief.set()
+      self.logger.log((-1, f'memory {self.mb(rss)} MB of {self.mb(self.limit)} MB, producers resumed'))
+    elif self.pressure and monotonic() - self.paused >= self.max_pause:
+      self.pressure = False
+      self.exceeded = True
+      self.__relief.set()
+      self.logger.log((-3, f'memory {self.mb(rss)} MB of {self.mb(self.limit)} MB, ' + \
+                           f'limit not held after {self.max_pause} s, producers resumed'))
+    #endif
+  #check
+
+  def shrink(self, force=False):
+    """
+      param: force  shrink every subsystem, not only the ones over budget
+    """
+    usage = self.usage()
+    for name, (_, _, shrink) in list(self.subsystems.items()):
+      if shrink is None or not (force or usage.get(name, 0) > self.budget(name)):
+        continue
+
+      try:
+        shrink()
+      except Exception as e:
+        self.logger.debug(f'shrink {name}: {e}')
+    #endfor
+
+    self.shrinks += 1
+  #shrink
+
+  def wait(self, timeout=None):
+    """
+      block the calling producer while the process is over the hard limit
+
+      return: True if there is no pressure
+    """
+    if not self.pressure:
+      return True
+
+    return self.__relief.wait(timeout)
+  #wait
+
+  def run(self):
+    while not self.terminate:
+      self.check()
+      self.__stop.wait(self.interval)
+    #endwhile
+  #run
+
+  def stop(self):
+    self.terminate = True
+    self.pressure  = False
+    self.__relief.set()
+    self.__stop.set()
+    self.join()
+  #stop
+
+  def __usage_mb__(self):
+    return { x: self.mb(y) for x, y in self.usage().items() }
+
+  @staticmethod
+  def mb(value):
+    return round(value / 1024 / 1024, 2)
+#class MemoryGovernor
+
+
+memory_governor = MemoryGovernor()  # configured and started by irondome
+memory_governor.register('logger',
+                         lambda: Logger.writer.queue.qsize() * 256 if Logger.writer else 0, 0.05)
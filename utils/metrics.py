@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+#
+# ./utils/metrics.py
+#
+# Counters and gauges of irondome, served as text or json on a unix socket
+#
+import os, json, socket, stat, errno
+
+from threading import Thread, Lock, local
+from time      import time
+
+
+class MetricCounter(object):
+  """
+    Counter with one cell per thread, inc() only touches the cell of the
+    calling thread (no lock), value adds every cell
+  """
+
+  def __init__(self, name, doc=''):
+    self.name  = name
+    self.doc   = doc
+    self.cells = []      # [ value ] of every thread, kept after it exits
+    self.__local = local()
+    self.__lock  = Lock()
+  #__init__
+
+  def inc(self, n=1):
+    try:
+      self.__local.cell[0] += n
+    except AttributeError:
+      self.__local.cell = [ n ]
+      with self.__lock:
+        self.cells.append(self.__local.cell)
+  #inc
+
+  @property
+  def value(self):
+    return sum(x[0] for x in list(self.cells))
+#class MetricCounter
+
+
+class MetricGauge(object):
+  """
+    Last value set, or the value of a function called on every snapshot. The
+    function can return a dict { label: value }, e.g. one value per disk
+  """
+
+  def __init__(self, name, doc='', function=None, label=None):
+    self.name     = name
+    self.doc      = doc
+    self.function = function
+    self.label    = label   # name of the label of the keys of a dict
+    self.current  = 0
+  #__init__
+
+  def set(self, value):
+    self.current = value
+  #set
+
+  @property
+  def value(self):
+    return self.function() if self.function else self.current
+#class MetricGauge
+
+
+class Metrics(object):
+  """
+    Registry of counters and gauges by name
+  """
+
+  def __init__(self):
+    self.metrics = {}
+    self.start   = time()
+    self.__lock  = Lock()
+  #__init__
+
+  def counter(self, name, doc=''):
+    """
+      return: MetricCounter name, created the first time
+    """
+    with self.__lock:
+      metric = self.metrics.get(name)
+      if not isinstance(metric, MetricCounter):
+        metric = self.metrics[name] = MetricCounter(name, doc)
+
+    return metric
+  #counter
+
+  def gauge(self, name, doc='', function=None, label=None):
+    """
+      return: MetricGauge name, the function replaces the one of a previous
+              gauge with the same name
+    """
+    with self.__lock:
+      metric = self.metrics.get(name)
+      if not isinstance(metric, MetricGauge) or function is not None:
+        metric = self.metrics[name] = MetricGauge(name, doc, function, label)
+
+    return metric
+  #gauge
+
+  def snapshot(self):
+    """
+      return: dict { name: value }, value of labeled gauges is a dict
+    """
+    out = { 'uptime': round(time() - self.start, 3) }
+    for name, metric in sorted(self.metrics.items()):
+      try:
+        value = metric.value
+      except Exception:
+        value = None  # a gauge of an object being stopped
+
+      if isinstance(value, dict):
+        value = { str(k): self.__number__(v) for k, v in value.items() }
+      else:
+        value = self.__number__(value)
+
+      out[name] = value
+    #endfor
+
+    return out
+  #snapshot
+
+  def text(self):
+    """
+      return: snapshot as lines `name value` or `name{label="key"} value`
+    """
+    lines = []
+    for name, value in self.snapshot().items():
+      metric = self.metrics.get(name)
+      if metric is not None and metric.doc:
+        lines.append(f'# {name} {metric.doc}')
+
+      if isinstance(value, dict):
+        label = metric.label or 'key'
+        lines += [ f'{name}{{{label}="{k}"}} {v}' for k, v in value.items() ]
+      else:
+        lines.append(f'{name} {value}')
+    #endfor
+
+    return '\n'.join(lines) + '\n'
+  #text
+
+  def json(self):
+    return json.dumps(self.snapshot()) + '\n'
+
+  @staticmethod
+  def __number__(value):
+    try:
+      return round(float(value), 3) if value is not None else None
+    except (TypeError, ValueError):
+      return None
+  #__number__
+#class Metrics
+
+
+class MetricsServer(Thread):
+  """
+    Unix socket returning a snapshot of metrics to every connection. The
+    client can send `json` (default `text`) before shutting down its side:
+      socat - UNIX-CONNECT:/run/irondome/metrics.sock
+      echo json | socat - UNIX-CONNECT:/run/irondome/metrics.sock
+  """
+
+  timeout = 0.2  # seconds waiting for the request of a client
+
+  def __init__(self, path, registry=None):
+    Thread.__init__(self, name='MetricsServer', daemon=True)
+
+    self.path      = path
+    self.registry  = registry or metrics_registry
+    self.terminate = False
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+      os.makedirs(directory)
+
+    # a socket left by a previous run is removed, any other file is not
+    if os.path.lexists(path):
+      if not stat.S_ISSOCK(os.lstat(path).st_mode):
+        raise FileExistsError(errno.EEXIST, 'not a unix socket', path)
+
+      os.unlink(path)
+    #endif
+
+    # created 0600, with the chmod after bind() there is a window where
+    # anyone can connect. The umask is of the process, the server is
+    # created before the other threads start
+    self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o177)
+    try:
+      self.sock.bind(path)
+    finally:
+      os.umask(umask)
+
+    self.sock.listen(8)
+    self.sock.settimeout(0.5)
+  #__init__
+
+  def run(self):
+    while not self.terminate:
+      try:
+        conn, _ = self.sock.accept()
+      except socket.timeout:
+        continue
+      except OSError:
+        break
+
+      with conn:
+        try:
+          conn.settimeout(self.timeout)
+          try:
+            request = conn.recv(64).strip().lower()
+          except socket.timeout:
+            request = b''
+
+          body = self.registry.json() if request == b'json' else self.registry.text()
+          conn.sendall(body.encode())
+        except OSError:
+          pass
+      #endwith
+    #endwhile
+
+    self.sock.close()
+    if os.path.exists(self.path):
+      os.unlink(self.path)
+  #run
+
+  def stop(self):
+    self.terminate = True
+    self.join()
+  #stop
+#class MetricsServer
+
+
+metrics_registry = Metrics()  # shared by FSWatcher, FSIntegrity and IOStats
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+#
+# ./utils/profiling.py
+#
+# Latency histograms of the stages of the hot path and cProfile sessions
+# started at runtime
+#
+import os, cProfile, pstats
+
+from threading import Thread, Timer, Lock, local, current_thread
+from time      import perf_counter_ns, monotonic, sleep, strftime
+
+
+class StageHistogram(object):
+  """
+    Fixed buckets of powers of two microseconds, bucket i counts the times
+    under 2^i * 1.024 us (ns >> 10) and the last one everything above.
+    observe() is O(1), the increments are not locked, a sample can be lost
+    between two threads.
+  """
+  __slots__ = ('name', 'counts', 'count', 'total', 'maximum')
+
+  buckets = 28   # 1 us .. 2^26 us (67 s) and overflow
+
+  def __init__(self, name):
+    self.name = name
+    self.reset()
+  #__init__
+
+  def reset(self):
+    self.counts  = [ 0 ] * self.buckets
+    self.count   = 0
+    self.total   = 0   # ns
+    self.maximum = 0   # ns
+  #reset
+
+  def observe(self, ns):
+    self.counts[min((ns >> 10).bit_length(), self.buckets - 1)] += 1
+    self.count += 1
+    self.total += ns
+    if ns > self.maximum:
+      self.maximum = ns
+  #observe
+
+  def percentile(self, p):
+    """
+      return: upper bound in us of the bucket of the percentile p, the
+              maximum for the last bucket
+    """
+    if not self.count:
+      return 0.0
+
+    rank, seen = (p / 100 * self.count, 0)
+    for n, counted in enumerate(self.counts):
+      seen += counted
+      if seen >= rank and counted:
+        return min(float(1 << n) * 1.024, self.maximum / 1000)
+    #endfor
+
+    return self.maximum / 1000
+  #percentile
+
+  def summary(self):
+    """
+      return: dict count, mean, p50, p90, p99 and max in us
+    """
+    return {
+      'count': self.count,
+      'mean': round(self.total / self.count / 1000, 1) if self.count else 0.0,
+      'p50': round(self.percentile(50), 1),
+      'p90': round(self.percentile(90), 1),
+      'p99': round(self.percentile(99), 1),
+      'max': round(self.maximum / 1000, 1)
+    }
+  #summary
+#class StageHistogram
+
+
+class Profiler(object):
+  """
+    Stage timers are used as
+
+      start = profiler.start()
+      ...
+      profiler.stop(stage, start)
+
+    start() returns 0 while the profiler is disabled and stop() ignores it,
+    so a disabled timer is two calls and no clock read.
+
+    A cProfile session is enabled by every thread calling checkpoint() in
+    its loop (reader, verifiers, log writer) the next time it runs, and
+    merged when the session stops. cProfile only sees the thread where it
+    was enabled, a thread blocked all the session is not in the profile.
+    From python 3.12 (sys.monitoring) only one cProfile can be enabled in
+    the process and it sees every thread, the threads that cannot enable
+    theirs log a warning and go on.
+  """
+
+  join_timeout = 2.0   # seconds waiting for the threads to leave a session
+
+  def __init__(self):
+    self.enabled   = False
+    self.stages    = {}      # name -> StageHistogram
+    self.session   = None    # dict of the running cProfile session
+    self.directory = '/tmp'  # where the stats of the sessions are written
+
+    self.__local = local()
+    self.__lock  = Lock()
+  #__init__
+
+  def stage(self, name):
+    """
+      return: StageHistogram name, created the first time
+    """
+    with self.__lock:
+      if name not in self.stages:
+        self.stages[name] = StageHistogram(name)
+
+      return self.stages[name]
+  #stage
+
+  def start(self):
+    return perf_counter_ns() if self.enabled else 0
+
+  def stop(self, stage, start):
+    if start:
+      stage.observe(perf_counter_ns() - start)
+
+  def enable(self, enabled=True):
+    self.enabled = enabled
+
+  def reset(self):
+    for stage in list(self.stages.values()):
+      stage.reset()
+  #reset
+
+  def summary(self):
+    """
+      return: dict { stage: summary } of the stages with samples
+    """
+    return { x.name: x.summary() for x in list(self.stages.values()) if x.count }
+
+  def dump(self, logger):
+    """
+      log one line per stage, counts and percentiles in us
+    """
+    if not self.enabled:
+      logger.log((-1, 'stage timers disabled'))
+      return
+
+    summary = self.summary()
+    if not summary:
+      logger.log((-1, 'stage timers: no samples'))
+
+    for name, s in sorted(summary.items()):
+      logger.log((-1, f'stage {name}: {s["count"]} calls, mean {s["mean"]} us, ' + \
+                      f'p50 {s["p50"]} us, p90 {s["p90"]} us, p99 {s["p99"]} us, max {s["max"]} us'))
+  #dump
+
+  def checkpoint(self):
+    """
+      called by the hot threads in their loop, enables or disables the
+      cProfile of the thread when a session started or stopped
+    """
+    session = self.session
+    current = self.__local.__dict__.get('session')
+    if current is session:
+      return
+
+    profile = self.__local.__dict__.get('profile')
+    if profile is not None:
+      profile.disable()
+      current['done'].append(profile)
+
+    self.__local.session = session
+    self.__local.profile = None
+
+    if session is None:
+      return
+
+    profile = cProfile.Profile()
+    try:
+      profile.enable()
+    except ValueError as err:   # another profiler is active, python >= 3.12
+      with self.__lock:
+        session['failed'] += 1
+        warn = session['failed'] == 1
+
+      if warn and session['logger']:
+        session['logger'].log((-2, f'cProfile not enabled in {current_thread().name}, {err}'))
+      return
+    #endtry
+
+    self.__local.profile = profile
+    with self.__lock:
+      session['threads'] += 1
+  #checkpoint
+
+  def start_profile(self, seconds=60, logger=None):
+    """
+      param: seconds  the session stops by itself after this time
+    """
+    with self.__lock:
+      if self.session is not None:
+        return False
+
+      self.session = { 'start': monotonic(), 'threads': 0, 'done': [], 'failed': 0,
+                       'logger': logger, 'timer': Timer(seconds, self.stop_profile, (logger,)) }
+      self.session['timer'].daemon = True
+      self.session['timer'].start()
+    #endwith
+
+    if logger:
+      logger.log((-1, f'cProfile session started for {seconds} s'))
+
+    return True
+  #start_profile
+
+  def stop_profile(self, logger=None):
+    """
+      end the session, wait for the threads to disable their cProfile and
+      write the merged stats to directory
+
+      return: path of the stats, None if there was no session or no thread
+    """
+    with self.__lock:
+      session, self.session = (self.session, None)
+
+    if session is None:
+      return None
+
+    session['timer'].cancel()
+    self.checkpoint()
+
+    deadline = monotonic() + self.join_timeout
+    while len(session['done']) < session['threads'] and monotonic() < deadline:
+      sleep(0.05)
+
+    profiles = list(session['done'])
+    if not profiles:
+      if logger:
+        logger.log((-2, 'cProfile session stopped, no thread profiled'))
+      return None
+
+    stats = pstats.Stats(profiles[0])
+    for profile in profiles[1:]:
+      stats.add(profile)
+
+    path = os.path.join(self.directory, f'irondome-{os.getpid()}-{strftime("%Y%m%d-%H%M%S")}.prof')
+    stats.dump_stats(path)
+
+    if logger:
+      elapsed = round(monotonic() - session['start'], 1)
+      failed  = f', {session["failed"]} without cProfile' if session['failed'] else ''
+      logger.log((-1, f'cProfile session of {elapsed} s, {len(profiles)} of ' + \
+                      f'{session["threads"]} threads{failed}, stats in {path}'))
+
+      # (file, line, function) -> (primitive calls, calls, tottime, cumtime, callers)
+      top = sorted(stats.stats.items(), key=lambda x: x[1][2], reverse=True)[:10]
+      for (filename, line, function), (_, calls, tottime, cumtime, _) in top:
+        logger.log((-1, f'  {tottime:8.3f} s {cumtime:8.3f} s {calls:8} ' + \
+                        f'{os.path.basename(filename)}:{line} {function}'))
+    #endif
+
+    return path
+  #stop_profile
+
+  def toggle_profile(self, seconds=60, logger=None):
+    """
+      start a session, or stop the running one in a thread (it waits for the
+      hot threads, not to be done in a signal handler)
+    """
+    if not self.start_profile(seconds, logger):
+      Thread(name='ProfilerStop', target=self.stop_profile, args=(logger,), daemon=True).start()
+  #toggle_profile
+#class Profiler
+
+
+profiler = Profiler()  # stage timers of FSWatcher, FSIntegrity, verify_event and LogWriter
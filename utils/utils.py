@@ -11,9 +11,23 @@ import hashlib
 
 
 from math             import log2
+from random           import Random
+from statistics       import pstdev
+from threading        import Lock
+from time             import monotonic
+from collections      import Counter
 from importlib        import import_module
 from importlib.util   import find_spec
 
+from utils.profiling import profiler
+from utils.metrics   import metrics_registry
+
+numpy = import_module('numpy') if find_spec('numpy') else None
+
+ENTROPY_BUFFER = 1024 * 1024  # bytes read per chunk
+
+stage_entropy = profiler.stage('entropy')
+
 
 def tohex(b):
   return f'{b:02x}'
@@ -46,41 +60,277 @@ def explore(path, directory=False):
 #explore
 
 
-def shannon_entropy(f):
-  if not os.path.isfile(f):
-    return 0.0
+def chunked(iterable, size):
+  chunk = []
+  for item in iterable:
+    chunk.append(item)
+    if len(chunk) >= size:
+      yield chunk
+      chunk = []
+  #endfor
+
+  if chunk:
+    yield chunk
+#chunked
+
+
+class ByteHistogram(object):
+  """
+    Byte frequency counter, data is counted in bulk per chunk. It uses
+    numpy.bincount when numpy is installed, collections.Counter otherwise,
+    about 30 times slower (17 MB/s against 550 MB/s on one core).
+  """
+
+  pairs_min = 128 * 1024   # bytes from which byte pairs are counted, the 65536
+                           # counters cost more than they save on less data
+
+  def __init__(self):
+    self.total = 0
+    self.freq  = numpy.zeros(256, dtype=numpy.int64) if numpy else [ 0 ] * 256
+  #__init__
+
+  def update(self, data):
+    # bytes of any buffer, a memoryview of array('I') has 4 per element
+    data = memoryview(data).cast('B')
+    if not len(data):
+      return
+
+    if numpy and len(data) < self.pairs_min:
+      self.freq += numpy.bincount(numpy.frombuffer(data, dtype=numpy.uint8), minlength=256)
+    elif numpy:
+      # count byte pairs, half the elements to bincount, then fold the
+      # 65536 pair counters into low and high byte counters
+      array = numpy.frombuffer(data, dtype=numpy.uint8)
+      even  = len(array) & ~1
+      pairs = numpy.bincount(array[:even].view(numpy.uint16),
+                             minlength=65536).reshape(256, 256)
+
+      self.freq += pairs.sum(axis=0)
+      self.freq += pairs.sum(axis=1)
+
+      if even != len(array):
+        self.freq[array[-1]] += 1
+    else:
+      freq = self.freq
+      for b, n in Counter(data).items():
+        freq[b] += n
+    #endif
+
+    self.total += len(data)
+  #update
 
-  entropy = 0.0
-  total   = 0.0
-  freq    = [ 0 * _ for _ in range(256 )]
+  def merge(self, other):
+    """
+      add the counters of other ByteHistogram
+    """
+    if numpy:
+      self.freq += other.freq
+    else:
+      self.freq = [ x + y for x, y in zip(self.freq, other.freq) ]
 
-  with open(f, 'rb') as fr:
-    while True:
-      b = fr.read(1)
-      if not b:
-        break
+    self.total += other.total
+  #merge
 
-      freq[ord(b)] += 1
-    #endwhile
+  @property
+  def entropy(self):
+    if self.total <= 0:
+      return 0.0
 
-    total = fr.tell()
-  #endwith
+    if numpy:
+      prob = self.freq[self.freq > 0] / self.total
+      return round(0.0 - float((prob * numpy.log2(prob)).sum()), 2)   # 0.0, not -0.0
+    #endif
 
-  if total > 0:
-    while len(freq) > 0:
-      s = freq.pop(0)
+    entropy = 0.0
+    for s in self.freq:
       if s == 0:
         continue
 
-      prob = s / total
+      prob = s / self.total
       entropy += prob * log2(prob)
-    #endwhile
+    #endfor
+
+    return round(0.0 - entropy, 2)
+  #entropy
+#class ByteHistogram
+
+
+class EntropySampler(object):
+  """
+    Entropy of a large file from a few blocks: the head, the tail and one
+    block at a pseudo-random offset in each equal part between them. The
+    offsets are seeded by the inode, a file is always sampled at the same
+    places. The bytes sampled across all threads are limited by one shared
+    token bucket of rate bytes per second, with the bucket empty a file is
+    sampled with less blocks (at least one) instead of waiting. The bucket
+    only bounds these reads, the SHA-256 of a verified file still reads all
+    of it.
+
+    The confidence, between 0 and 1, is lower with few blocks and when the
+    entropy of the blocks differs (a plain header before encrypted data).
+  """
+
+  def __init__(self, exact=8 * 1024 * 1024, per_file=1024 * 1024, block=64 * 1024,
+                     rate=64 * 1024 * 1024):
+    """
+      param: exact     files up to this size are read whole
+      param: per_file  bytes sampled per file
+      param: block     bytes per sampled block, multiple of 4 kB
+      param: rate      bytes per second sampled across all threads, 0 unlimited
+    """
+    self.exact    = exact
+    self.per_file = per_file
+    self.block    = block
+    self.rate     = rate
+
+    self.sampled = metrics_registry.counter('entropy_sampled', 'files with a sampled entropy')
+    self.limited = metrics_registry.counter('entropy_limited',
+                                            'files sampled with less blocks by the rate')
+
+    self.__tokens = rate
+    self.__last   = monotonic()
+    self.__lock   = Lock()
+  #__init__
+
+  def take(self, n, minimum=0):
+    """
+      return: bytes granted out of n, at least minimum (the bucket can go
+              into debt)
+    """
+    if not self.rate:
+      return n
+
+    with self.__lock:
+      now = monotonic()
+      self.__tokens = min(self.rate, self.__tokens + (now - self.__last) * self.rate)
+      self.__last   = now
+
+      granted = max(min(n, int(self.__tokens)), minimum)
+      self.__tokens -= granted
+    #endwith
+
+    return granted
+  #take
+
+  def offsets(self, size, count, seed):
+    """
+      return: sorted offsets of count blocks, head, tail and one random
+              offset aligned to 4 kB in each part of the middle
+    """
+    block = self.block
+    if count <= 1:
+      return [ 0 ]
+
+    out    = [ 0, size - block ]
+    rng    = Random(seed)
+    middle = size - 2 * block
+    parts  = count - 2
+
+    for n in range(parts):
+      low  = block + n * middle // parts
+      high = block + (n + 1) * middle // parts - block
+      out.append(max(block, rng.randint(low, max(low, high)) & ~4095))
+    #endfor
+
+    return sorted(out)
+  #offsets
+
+  def sample(self, fd, st):
+    """
+      param: fd  file descriptor, read with pread, its offset does not move
+      param: st  fstat of fd
+
+      return: tuple(entropy, confidence)
+    """
+    wanted = max(1, self.per_file // self.block)
+    count  = max(1, self.take(wanted * self.block, self.block) // self.block)
+    count  = min(count, max(1, st.st_size // self.block))
+
+    self.sampled.inc()
+    if count < wanted:
+      self.limited.inc()
+
+    histogram = ByteHistogram()
+    entropies = []
+    for offset in self.offsets(st.st_size, count, st.st_ino):
+      data = os.pread(fd, self.block, offset)
+      if not data:
+        continue
+
+      part = ByteHistogram()
+      part.update(data)
+      histogram.merge(part)
+      entropies.append(part.entropy)
+    #endfor
+
+    agreement = max(0.0, 1 - pstdev(entropies) / 2) if len(entropies) > 1 else 0.5
+    coverage  = len(entropies) / (len(entropies) + 2)
+
+    return histogram.entropy, round(agreement * coverage, 2)
+  #sample
+#class EntropySampler
+
+
+entropy_sampler = EntropySampler()  # configured by irondome -entropy
+
+
+def shannon_entropy(f, buffer=None, sample=False):
+  """
+    param: f       file path (str or bytes), binary file object opened for
+                   reading, or a bytearray/memoryview with the data already read
+    param: buffer  optional bytearray reused for the chunked reads
+    param: sample  files larger than entropy_sampler.exact are sampled
+
+    return: float entropy in bits per byte, with sample tuple(entropy,
+            confidence), confidence 1.0 when every byte was read
+  """
+  if not isinstance(f, (bytearray, memoryview)) and not hasattr(f, 'readinto'):
+    if not os.path.isfile(f):
+      return (0.0, 1.0) if sample else 0.0
+
+    with open(f, 'rb') as fr:
+      return shannon_entropy(fr, buffer, sample)
   #endif
 
-  return round(-entropy, 2)
+  start     = profiler.start()
+  histogram = ByteHistogram()
+  result    = None
+
+  if isinstance(f, (bytearray, memoryview)):
+    histogram.update(f)
+  else:
+    st = os.fstat(f.fileno()) if sample else None
+    if st and st.st_size > entropy_sampler.exact:
+      result = entropy_sampler.sample(f.fileno(), st)
+    else:
+      read_histogram(f, histogram, buffer)
+  #endif
+
+  profiler.stop(stage_entropy, start)
+
+  if not sample:
+    return histogram.entropy
+
+  return result if result else (histogram.entropy, 1.0)
 #shannon_entropy
 
 
+def read_histogram(fr, histogram, buffer=None):
+  buffer = buffer if buffer is not None else bytearray(ENTROPY_BUFFER)
+  view   = memoryview(buffer)
+
+  while True:
+    n = fr.readinto(buffer)
+    if not n:
+      break
+
+    histogram.update(view[:n])
+  #endwhile
+
+  return histogram
+#read_histogram
+
+
 class ToObject:
 
   def __init__(self, **kwargs):